@@ -33,9 +33,13 @@ from PySide6.QtWidgets import (
 )
 
 from maltReaderJSON import MaltReaderJSON
+from maltReaderPool import loadReaders
+from maltReaderMerge import mergeProfiles
 from maltQtTimeline import MaltQtTimeline
 from maltQtGlobalMax import MaltQtGlobalMax
 from maltQtLeaks import MaltQtLeaks
+from maltQtShortLived import MaltQtShortLived
+from maltQtRollup import MaltQtRollup
 from maltQtPreferences import MaltQtPreferences
 from maltQtUtils import fileSelect
 
@@ -48,15 +52,24 @@ class MaltQt:
             self.setMinimumWidth(800)
             self.setMinimumHeight(900)
 
-    def __init__(self, fname, sourceDirs=None):
+    def __init__(
+        self, fname, sourceDirs=None, stream=False, cache=True, rules=None, data=None
+    ):
         """
-        reads in the json from file and initializes timeline view
+        reads in the json from file and initializes timeline view.
+        If data is given, it is the already loaded MaltReaderJSON of
+        fname.
         """
         # First load the data
-        try:
-            self.data = MaltReaderJSON(fname)
-        except:
-            raise ValueError(f"Unable to load JSON file {fname}")
+        if data is not None:
+            self.data = data
+        else:
+            try:
+                self.data = MaltReaderJSON(
+                    fname, stream=stream, cache=cache, rules=rules
+                )
+            except:
+                raise ValueError(f"Unable to load JSON file {fname}")
 
         self.window = self.MainWindow(os.path.split(fname)[1])
         self.window.resize(1800, 900)
@@ -86,6 +99,18 @@ class MaltQt:
         self.leaks = MaltQtLeaks(self.data)
         tabs.addTab(self.leaks, " &Leaks")
 
+        # Short-lived allocations tab, if MALT recorded lifetimes
+        try:
+            self.shortLived = MaltQtShortLived(self.data)
+            tabs.addTab(self.shortLived, " &Short-Lived")
+        except ValueError as e:
+            print(e)
+            self.shortLived = None
+
+        # Rollups by directory, project root and library
+        self.rollup = MaltQtRollup(self.data)
+        tabs.addTab(self.rollup, " &Directories")
+
         # Preferences tab
         self.prefs = MaltQtPreferences(sourceDirs)
         tabs.addTab(self.prefs, " &Preferences")
@@ -118,6 +143,43 @@ if __name__ == "__main__":
         action="store",
         help="A list of comma separated directories for source paths",
     )
+    parser.add_argument(
+        "-r",
+        dest="rules",
+        action="append",
+        help="Add a filter rule '[+|!]field:regex' with field one of function, file or library, or a preset such as @jemalloc, @tcmalloc or @kokkos.  May be repeated",
+    )
+    parser.add_argument(
+        "-s",
+        dest="stream",
+        action="store_true",
+        help="Parse the JSON files incrementally to reduce memory use",
+    )
+    parser.add_argument(
+        "-x",
+        dest="cache",
+        action="store_false",
+        help="Do not read or write the cache file kept next to each JSON file",
+    )
+    parser.add_argument(
+        "-j",
+        dest="workers",
+        action="store",
+        type=int,
+        help="Number of processes used to load the files (default: one per file, at most one per CPU)",
+    )
+    parser.add_argument(
+        "-m",
+        dest="merge",
+        action="store_true",
+        help="Merge the files, e.g. one per MPI rank, into a single profile",
+    )
+    parser.add_argument(
+        "-u",
+        dest="distinct",
+        action="store_true",
+        help="Credit each function and source line once per stack, so that recursion is not counted several times",
+    )
     parser.add_argument("files", help="remainder of command line", nargs="*")
     args = parser.parse_args()
     dirs = args.dirs.split(",") if args.dirs is not None else []
@@ -130,11 +192,36 @@ if __name__ == "__main__":
         fname = fileSelect(None, myFilter="JSON Files (*.json *.JSON)", exists=True)
         if fname is not None:
             args.files = [fname]
+    # parse, filter and index all the files in parallel
+    fnames = args.files
+    if args.merge and len(fnames) > 0:
+        readers = [
+            mergeProfiles(
+                fnames,
+                None,
+                args.stream,
+                args.cache,
+                args.rules,
+                args.workers,
+                args.distinct,
+            )
+        ]
+        fnames = [f"{fnames[0]} + {len(fnames) - 1} more ranks"]
+    else:
+        readers = loadReaders(
+            fnames,
+            None,
+            args.stream,
+            args.cache,
+            args.rules,
+            args.workers,
+            args.distinct,
+        )
     qtm = []
-    for f in args.files:
+    for f, data in zip(fnames, readers):
         print("opening ", f, f is None)
         try:
-            qtm.append(MaltQt(f, dirs))
+            qtm.append(MaltQt(f, dirs, args.stream, args.cache, args.rules, data))
         except Exception as e:
             print(e)
             print(f"Unable to load file {f}")
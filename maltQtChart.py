@@ -17,9 +17,10 @@
 # This program is released under the BSD-3 license.
 # Please see the README.MD file for more details
 
-from PySide6.QtGui import QColor, QPainter, QPen
-from PySide6.QtCore import QPointF, QRect, QRectF
+from PySide6.QtGui import QColor, QPen
+from PySide6.QtCore import QLineF, QPointF, QRect, Qt, Slot
 from PySide6.QtCharts import QChart, QChartView
+from PySide6.QtWidgets import QGraphicsItem, QGraphicsLineItem, QRubberBand
 
 
 class MaltQtChart(QChart):
@@ -30,38 +31,162 @@ class MaltQtChart(QChart):
     def mousePressEvent(self, QMouseEvent):
         self.parentx.click(self.mapToValue(QMouseEvent.pos()))
 
-    def mouseMoveEvent(self, QMouseEvent):
-        self.parentx.click(self.mapToValue(QMouseEvent.pos()))
-
 
 class maltQChartView(QChartView):
+    """
+    The view of the timeline chart.  Besides clicking and dragging to
+    pick a point, the time axis can be zoomed with the wheel or by
+    dragging a band with the right mouse button (a right click zooms
+    back out) and panned by dragging with the middle button or with
+    Shift held down.  The points drawn for the new range are picked by
+    the timeline (see showSeries of maltQtTimeline.py).
+
+    The current point is marked by a line item of its own on top of
+    the chart, whose items are cached as pixmaps, so moving the marker
+    only repaints the strips it leaves and enters from the cache
+    rather than drawing the series again.
+    """
+
+    # Time range kept by one step of the wheel
+    wheelZoom = 0.8
+
     def __init__(self, parentx):
         super().__init__(parentx.chart)
         self.parentx = parentx
+        self.rubberBand = QRubberBand(QRubberBand.Rectangle, self)
+        self.zoomStart = None
+        self.panStart = None
 
-    def drawForeground(self, painter: QPainter, rect: QRectF):
-        """This is where we draw the red line when the timeline is clicked"""
-        super().drawForeground(painter, rect)
-        if not self.parentx.markIndex:
-            return
-        self.parentx.markIndex = True
-
+        chart = parentx.chart
+        self.cache_(chart)
+        self.marker = marker = QGraphicsLineItem(chart)
         pen = QPen(QColor("pink"))
-        pen.setWidth(0.25)
-        painter.setPen(pen)
+        pen.setWidth(0)
+        marker.setPen(pen)
+        marker.setZValue(100)
+        marker.hide()
+        chart.plotAreaChanged.connect(self.showMarker)
+        chart.axisX().rangeChanged.connect(self.showMarker)
+
+    def cache_(self, item):
+        """Caches the drawing of item and of all its children"""
+        item.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        for child in item.childItems():
+            self.cache_(child)
 
-        idx = self.parentx.lastIndex
-        v = self.parentx.values[idx]
-        if len(v) < self.parentx.idxMax:
+    @Slot()
+    def showMarker(self, *args):
+        """Moves the marker line to the current point of the timeline"""
+        parentx = self.parentx
+        marker = self.marker
+        idx = parentx.lastIndex
+        if not parentx.markIndex or idx is None:
+            marker.hide()
+            return
+        chart = parentx.chart
+        area = chart.plotArea()
+        x = chart.mapToPosition(QPointF(float(parentx.time[idx]), 0.0)).x()
+        if x < area.left() or x > area.right():
+            # the point is out of view
+            marker.hide()
             return
+        marker.setLine(QLineF(x, area.top(), x, area.bottom()))
+        marker.show()
+
+    def valueAt_(self, pos):
+        """Returns the chart value at pos of the view"""
         chart = self.parentx.chart
-        area: QRect = chart.plotArea()
-        t = float(v[self.parentx.idxT])
-        hmin = float(chart.axisX().min())
-        hmax = float(chart.axisX().max())
-        ratio = (t - hmin) / (hmax - hmin)
-        tpos = area.x() + area.width() * ratio
-        point = QPointF(tpos, area.y())
-        point2 = QPointF(tpos, area.y() + area.height())
-
-        painter.drawLine(point, point2)
+        return chart.mapToValue(chart.mapFromScene(self.mapToScene(pos)))
+
+    def timeAt_(self, pos):
+        """Returns the time at pos of the view"""
+        return self.valueAt_(pos).x()
+
+    def setTimeRange(self, t0, t1):
+        """Shows the times t0 to t1, kept within the timeline"""
+        time = self.parentx.time
+        if len(time) == 0:
+            return
+        first, last = float(time[0]), float(time[-1])
+        # at least a few points stay in view
+        width = min(max(t1 - t0, 4 * (last - first) / max(len(time), 1)), last - first)
+        if width <= 0:
+            return
+        t0 = min(max(t0, first), last - width)
+        self.parentx.chart.axisX().setRange(t0, t0 + width)
+
+    def resetZoom(self):
+        """Shows the whole timeline"""
+        time = self.parentx.time
+        if len(time) == 0:
+            return
+        self.setTimeRange(float(time[0]), float(time[-1]))
+
+    def zoom(self, factor, t=None):
+        """Scales the time range by factor around time t (its center)"""
+        if len(self.parentx.time) == 0:
+            return
+        axis = self.parentx.chart.axisX()
+        t0, t1 = axis.min(), axis.max()
+        if t is None:
+            t = (t0 + t1) / 2
+        self.setTimeRange(t - (t - t0) * factor, t + (t1 - t) * factor)
+
+    def mousePressEvent(self, event):
+        pos = event.position().toPoint()
+        if event.button() == Qt.RightButton:
+            self.zoomStart = pos
+            self.rubberBand.setGeometry(QRect(pos, pos))
+            self.rubberBand.show()
+        elif event.button() == Qt.MiddleButton or (
+            event.button() == Qt.LeftButton and event.modifiers() & Qt.ShiftModifier
+        ):
+            # there is nothing to pan over in an empty timeline
+            if len(self.parentx.time) > 0:
+                axis = self.parentx.chart.axisX()
+                self.panStart = (pos.x(), axis.min(), axis.max())
+        else:
+            super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        pos = event.position().toPoint()
+        if self.zoomStart is not None:
+            area = self.parentx.chart.plotArea()
+            top = self.mapFromScene(area.topLeft()).y()
+            bottom = self.mapFromScene(area.bottomLeft()).y()
+            left = min(pos.x(), self.zoomStart.x())
+            right = max(pos.x(), self.zoomStart.x())
+            self.rubberBand.setGeometry(QRect(left, top, right - left, bottom - top))
+        elif self.panStart is not None:
+            x, t0, t1 = self.panStart
+            width = max(self.parentx.chart.plotArea().width(), 1)
+            dt = (pos.x() - x) * (t1 - t0) / width
+            self.setTimeRange(t0 - dt, t1 - dt)
+        elif event.buttons() & Qt.LeftButton:
+            # whichever item took the press, a drag moves the point
+            self.parentx.drag(self.valueAt_(pos))
+        else:
+            super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        pos = event.position().toPoint()
+        if self.zoomStart is not None:
+            self.rubberBand.hide()
+            start = self.zoomStart
+            self.zoomStart = None
+            if abs(pos.x() - start.x()) > 3:
+                t0, t1 = sorted([self.timeAt_(start), self.timeAt_(pos)])
+                self.setTimeRange(t0, t1)
+            else:
+                self.zoom(2.0, self.timeAt_(pos))
+        elif self.panStart is not None:
+            self.panStart = None
+        else:
+            super().mouseReleaseEvent(event)
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120.0
+        if steps == 0:
+            return super().wheelEvent(event)
+        self.zoom(self.wheelZoom**steps, self.timeAt_(event.position().toPoint()))
+        event.accept()
@@ -21,6 +21,7 @@ Click to show stack information.
 # Please see the README.MD file for more details
 
 import re
+import numpy as np
 from PySide6.QtCore import Slot, Qt
 from PySide6.QtWidgets import (
     QAbstractItemView,
@@ -32,7 +33,7 @@ from PySide6.QtWidgets import (
     QVBoxLayout,
     QWidget,
 )
-from maltQtUtils import leftAlignedItem, rightAlignedItem
+from maltQtUtils import leftAlignedItem, numberItem, rightAlignedItem, stackItem
 from maltQtStack import MaltQtStackView
 from maltQtFile import MaltQtFile
 
@@ -40,6 +41,21 @@ from maltQtFile import MaltQtFile
 class MaltQtGlobalMax(QWidget):
     """Creates a Global Peak Memory Usage information widget"""
 
+    # Columns of MALT statistics: label, infos fields, value (given
+    # the ticks per second and the fields), format
+    infoColumns = [
+        ("allocs", ["alloc.count"], lambda t, c: c, "{:d}"),
+        ("frees", ["free.count"], lambda t, c: c, "{:d}"),
+        ("max size", ["alloc.max"], lambda t, m: m, "{:d}"),
+        (
+            "mean life (s)",
+            ["lifetime.sum", "lifetime.count"],
+            lambda t, s, c: s / np.maximum(c, 1) / t,
+            "{:.3g}",
+        ),
+        ("max alive (MB)", ["maxAliveReq"], lambda t, m: m / 1048576.0, "{:.3f}"),
+    ]
+
     def __init__(self, data):
         # Initialize the widget
         super().__init__()
@@ -54,8 +70,16 @@ class MaltQtGlobalMax(QWidget):
         info.setSizePolicy(size)
         info.setEditTriggers(QAbstractItemView.NoEditTriggers)
         info.setRowCount(len(peaks.keys()))
-        info.setColumnCount(3)
-        info.setHorizontalHeaderLabels(["memory (MB)", "location", "stackId"])
+        # merged profiles show the spread of each stack over the ranks
+        labels = ["memory (MB)", "location", "stackId"]
+        ranks = data.ranks
+        if ranks is not None:
+            labels += ["min (MB)", "mean (MB)", "max (MB)", "max rank"]
+        infoColumns = self.infoValues_(list(peaks.keys()))
+        infoStart = len(labels)
+        labels += [label for label, _, _ in infoColumns]
+        info.setColumnCount(len(labels))
+        info.setHorizontalHeaderLabels(labels)
         info.setFont("Courier New")
         alignFlags = Qt.AlignRight | Qt.AlignVCenter
         info.horizontalHeaderItem(0).setTextAlignment(alignFlags)
@@ -69,8 +93,19 @@ class MaltQtGlobalMax(QWidget):
             memItem.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
             sumGP += s["memory"]
             info.setItem(idx, 0, memItem)
-            info.setItem(idx, 1, leftAlignedItem(s["top"]))
+            flatten = lambda stackId=p: data.flattenStackFromId(stackId)
+            info.setItem(idx, 1, stackItem(s["top"], flatten))
             info.setItem(idx, 2, leftAlignedItem(p))
+            if ranks is not None:
+                for col, key in enumerate(("min", "mean", "max"), 3):
+                    item = rightAlignedItem(f"{float(s[key])/1048576.:>8.3f}")
+                    info.setItem(idx, col, item)
+                rankItem = rightAlignedItem(f"{s['argmax']:>6d}")
+                rankItem.setToolTip(ranks[s["argmax"]])
+                info.setItem(idx, 6, rankItem)
+            for col, (_, values, fmt) in enumerate(infoColumns, infoStart):
+                value = values[idx]
+                info.setItem(idx, col, numberItem(value, fmt.format(value)))
         info.setColumnHidden(2, True)
         print("Sum at global peak:", sumGP, sumGP / 1048576.0, "MB")
         info.setSortingEnabled(True)
@@ -105,6 +140,23 @@ class MaltQtGlobalMax(QWidget):
         info.show()
         self.cellClick(0, 0)
 
+    def infoValues_(self, stackIds):
+        """
+        Returns the label, values (one per stack of stackIds) and
+        format of the columns of MALT statistics that the profile has
+        """
+        stacks = self.data.stacks
+        rows = [stacks.rowOf[x] for x in stackIds]
+        # lifetimes are in ticks
+        ticks = float(self.data.data["globals"].get("ticksPerSecond", 1))
+        columns = []
+        for label, fields, value, fmt in self.infoColumns:
+            if not all(x in stacks.infoFields for x in fields):
+                continue
+            values = value(ticks, *[stacks.info(x)[rows] for x in fields])
+            columns.append((label, values.tolist(), fmt))
+        return columns
+
     @Slot()
     def cellClick(self, row, column):
         self.info.selectRow(row)
@@ -127,6 +179,8 @@ class MaltQtGlobalMax(QWidget):
     def fileShow(self, row, column):
         theLine = int(self.stack.item(row, 0).text())
         stackId = self.stack.item(row, 2).text()
+        if stackId not in self.data.instrMap:
+            return
         theFile = self.data.instrMap[stackId][1]
         self.stack.selectRow(row)
         self.fileArea.loadFile(theFile, theLine, self.getAlloc(theFile))
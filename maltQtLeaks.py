@@ -20,24 +20,38 @@ clicks to show stack information.
 # This program is released under the BSD-3 license.
 # Please see the README.MD file for more details
 
-import re
 from PySide6.QtCore import Slot, Qt
 from PySide6.QtWidgets import (
     QAbstractItemView,
+    QCheckBox,
+    QComboBox,
     QHBoxLayout,
+    QLabel,
     QSizePolicy,
     QTableWidget,
     QTableWidgetItem,
     QVBoxLayout,
     QWidget,
 )
-from maltQtUtils import leftAlignedItem, rightAlignedItem
+from maltQtUtils import numberItem, stackItem
 from maltQtStack import MaltQtStackView
 from maltQtFile import MaltQtFile
 
 
 class MaltQtLeaks(QWidget):
-    """Creates a Memory Leak information widget"""
+    """
+    Creates a Memory Leak information widget.  The leaks are grouped
+    by top frame, function, file:line or stack (see maltReaderLeaks.py)
+    and the grouping can be switched with the selector at the top.
+    """
+
+    # Labels of the leak table groupings
+    groupings = {
+        "top frame": "top",
+        "function": "function",
+        "file:line": "line",
+        "stack": "stack",
+    }
 
     def __init__(self, data):
         # Initialize the widget
@@ -46,13 +60,23 @@ class MaltQtLeaks(QWidget):
         # Squirrel away data
         self.data = data
         self.fileAlloc = data.fileAlloc
-        leaks = self.leaks = data.leaks
+        self.leakTable = leakTable = data.leakTable
+        self.groups = None
+
+        self.groupBy = groupBy = QComboBox()
+        groupBy.addItems(list(self.groupings))
+        groupBy.currentTextChanged.connect(self.regroup)
+        self.inclusive = inclusive = QCheckBox("inclusive")
+        inclusive.setToolTip(
+            "Credit every function or line of a stack, not just the top frame"
+        )
+        inclusive.toggled.connect(self.regroup)
+
         self.info = info = QTableWidget()
         size = QSizePolicy(QSizePolicy.Preferred, QSizePolicy.Preferred)
         size.setHorizontalStretch(1)
         info.setSizePolicy(size)
         info.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        info.setRowCount(len(leaks))
         info.setColumnCount(4)
         info.setHorizontalHeaderLabels(["memory (kB)", "count", "location", "index"])
         info.setFont("Courier New")
@@ -60,38 +84,15 @@ class MaltQtLeaks(QWidget):
         info.horizontalHeaderItem(0).setTextAlignment(alignFlags)
         info.horizontalHeaderItem(1).setTextAlignment(alignFlags)
         alignFlags = Qt.AlignLeft | Qt.AlignVCenter
-        info.horizontalHeaderItem(1).setTextAlignment(alignFlags)
-        sumLeak = 0
-        instrMap = self.data.instrMap
-        for idx, p in enumerate(leaks):
-            sumLeak += p["memory"]
-            count = f"{p['count']}"
-            memory = f"{float(p['memory'])/1024.:>12.3f}"
-            stack = p["stack"]
-            stackName = (
-                "no stack"
-                if len(stack) == 0
-                else (instrMap[stack[0]][0] if stack[0] in instrMap else stack[0])
-            )
-            memItem = QTableWidgetItem()
-            memItem.setData(Qt.DisplayRole, memory)
-            memItem.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            indexItem = QTableWidgetItem()
-            indexItem.setData(Qt.DisplayRole, idx)
-            info.setItem(idx, 0, memItem)
-            info.setItem(idx, 1, leftAlignedItem(count))
-            info.setItem(idx, 2, leftAlignedItem(stackName))
-            info.setItem(idx, 3, indexItem)
+        info.horizontalHeaderItem(2).setTextAlignment(alignFlags)
         info.setColumnHidden(3, True)
+        sumLeak = int(leakTable.memory.sum())
         print("Sum of all leaks:", sumLeak, sumLeak / 1048576.0, "MB")
-        info.setSortingEnabled(True)
-        info.sortItems(0, Qt.DescendingOrder)
         info.cellClicked.connect(self.cellClick)
 
         info.horizontalHeader().setStretchLastSection(True)
         info.setTextElideMode(Qt.ElideNone)
         info.setWordWrap(True)
-        info.resizeRowsToContents()
 
         self.stack = stack = MaltQtStackView(self)
         stack.horizontalHeader().setStretchLastSection(True)
@@ -104,14 +105,20 @@ class MaltQtLeaks(QWidget):
         rLayout.addWidget(self.fileArea)
         rLayout.addWidget(self.stack)
         self.main_layout = QHBoxLayout()
+        self.top_layout = QHBoxLayout()
+        self.top_layout.addWidget(QLabel("Leaks grouped by"))
+        self.top_layout.addWidget(groupBy)
+        self.top_layout.addWidget(inclusive)
+        self.top_layout.addStretch()
         self.lLayout = lLayout = QVBoxLayout()
+        self.lLayout.addLayout(self.top_layout)
         self.lLayout.addWidget(info)
         self.main_layout.addLayout(lLayout)
         self.main_layout.addLayout(rLayout)
         self.setLayout(self.main_layout)
 
+        self.regroup()
         info.show()
-        self.cellClick(0, 0)
 
     def getAlloc(self, theFile):
         try:
@@ -120,14 +127,53 @@ class MaltQtLeaks(QWidget):
             retval = {}
         return retval
 
+    @Slot()
+    def regroup(self, *args):
+        """Fills the leak table with the leaks grouped as selected"""
+        groupBy = self.groupings[self.groupBy.currentText()]
+        exclusive = not self.inclusive.isChecked()
+        # only functions and lines can be inclusive
+        self.inclusive.setEnabled(groupBy in ("function", "line"))
+        groups = self.groups = self.leakTable.aggregate(
+            groupBy, exclusive, self.data.distinct
+        )
+        data = self.data
+        leakTable = self.leakTable
+        info = self.info
+        info.setSortingEnabled(False)
+        info.clearContents()
+        info.setRowCount(len(groups["key"]))
+        for idx, (name, memory, count, s) in enumerate(
+            zip(
+                groups["name"],
+                groups["memory"].tolist(),
+                groups["count"].tolist(),
+                groups["stack"].tolist(),
+            )
+        ):
+            indexItem = QTableWidgetItem()
+            indexItem.setData(Qt.DisplayRole, idx)
+            info.setItem(idx, 0, numberItem(memory, f"{memory/1024.:>12.3f}"))
+            info.setItem(idx, 1, numberItem(count, f"{count}"))
+            flatten = lambda s=s: data.flattenStack(leakTable.stackAddrs(s))
+            info.setItem(idx, 2, stackItem(name, flatten))
+            info.setItem(idx, 3, indexItem)
+        info.setSortingEnabled(True)
+        info.sortItems(0, Qt.DescendingOrder)
+        info.resizeRowsToContents()
+        if len(groups["key"]) > 0:
+            self.cellClick(0, 0)
+
     @Slot()
     def cellClick(self, row, column):
         """When a cell is clicked in the leak table display the stack"""
         self.info.selectRow(row)
         index = int(self.info.item(row, 3).text())
-        stackIdList = self.leaks[index]["stack"]
-        stack = [self.data.instrMap[x] for x in stackIdList]
-        self.stack.updateStack(stack, row, index)
+        s = int(self.groups["stack"][index])
+        instrMap = self.data.instrMap
+        stack = [instrMap[x] for x in self.leakTable.stackAddrs(s)]
+        # a different grouping may put another stack on the same row
+        self.stack.updateStack(stack, (id(self.groups), row), index)
         self.fileShow(0, 0)
 
     @Slot()
@@ -135,6 +181,8 @@ class MaltQtLeaks(QWidget):
         """When a cell is clicked in the stack table display the file"""
         theLine = int(self.stack.item(row, 0).text())
         stackId = self.stack.item(row, 2).text()
+        if stackId not in self.data.instrMap:
+            return
         theFile = self.data.instrMap[stackId][1]
         self.stack.selectRow(row)
         self.fileArea.loadFile(theFile, theLine, self.getAlloc(theFile))
@@ -0,0 +1,158 @@
+"""
+Display the memory of the files, directories, project roots and
+libraries of a profile as a tree.
+"""
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+import posixpath
+
+from PySide6.QtCore import Slot, Qt
+from PySide6.QtWidgets import (
+    QComboBox,
+    QHBoxLayout,
+    QLabel,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+
+class rollupItem(QTreeWidgetItem):
+    """
+    A tree item showing the name and metrics of a rollup that sorts
+    the metric columns by value rather than by text
+    """
+
+    def __init__(self, name, values, node=-1):
+        # tree nodes only show the last part of their path
+        text = posixpath.basename(name) or name if node >= 0 else name
+        super().__init__([text] + [f"{v/1048576.:.3f}" for v in values])
+        self.values = values
+        self.node = node
+        for col in range(1, len(values) + 1):
+            self.setTextAlignment(col, Qt.AlignRight | Qt.AlignVCenter)
+        self.setToolTip(0, name)
+
+    def __lt__(self, other):
+        col = self.treeWidget().sortColumn()
+        if col > 0:
+            return self.values[col - 1] < other.values[col - 1]
+        return self.text(0) < other.text(0)
+
+
+class MaltQtRollup(QWidget):
+    """
+    Creates a widget showing the memory of the directories, project
+    roots, libraries or files of the program.  All the totals are
+    computed when the profile is loaded (see maltReaderRollup.py), the
+    children of a directory are only added when it is expanded.
+    """
+
+    levels = {
+        "directory": "directory",
+        "project root": "root",
+        "library": "library",
+        "file": "file",
+    }
+
+    def __init__(self, data):
+        # Initialize the widget
+        super().__init__()
+
+        # Squirrel away data
+        self.rollup = data.rollup
+
+        self.level = level = QComboBox()
+        level.addItems(list(self.levels))
+        level.currentTextChanged.connect(self.relevel)
+
+        self.info = info = QTreeWidget()
+        info.setColumnCount(6)
+        info.setHeaderLabels(
+            [
+                "location",
+                "inclusive (MB)",
+                "exclusive (MB)",
+                "incl@peak (MB)",
+                "excl@peak (MB)",
+                "leaks (MB)",
+            ]
+        )
+        info.setFont("Courier New")
+        for col in range(1, 6):
+            info.headerItem().setTextAlignment(col, Qt.AlignRight | Qt.AlignVCenter)
+        info.setSortingEnabled(True)
+        info.itemExpanded.connect(self.expand)
+
+        # Widgets are created, now lay them out
+        self.top_layout = QHBoxLayout()
+        self.top_layout.addWidget(QLabel("Memory by"))
+        self.top_layout.addWidget(level)
+        self.top_layout.addStretch()
+        self.main_layout = QVBoxLayout()
+        self.main_layout.addLayout(self.top_layout)
+        self.main_layout.addWidget(info)
+        self.setLayout(self.main_layout)
+
+        self.relevel(level.currentText())
+
+    def nodeItem_(self, node):
+        """Returns the tree item of node, expandable if it has children"""
+        rollup = self.rollup
+        item = rollupItem(rollup.paths[node], rollup.values[node].tolist(), node)
+        if len(rollup.children(node)) > 0:
+            item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+        return item
+
+    @Slot()
+    def relevel(self, level):
+        """Fills the tree with the rollups of level"""
+        rollup = self.rollup
+        level = self.levels[level]
+        info = self.info
+        info.setSortingEnabled(False)
+        info.clear()
+        if level == "directory":
+            items = [self.nodeItem_(x) for x in rollup.children(0).tolist()]
+        elif level == "library":
+            items = [
+                rollupItem(name, values)
+                for name, values in zip(rollup.libraries, rollup.libValues.tolist())
+            ]
+        else:
+            names = rollup.top(level)[0]
+            nodeOf = {path: node for node, path in enumerate(rollup.paths)}
+            items = [
+                rollupItem(name, rollup.values[nodeOf[name]].tolist())
+                for name in names
+            ]
+        info.addTopLevelItems(items)
+        info.setSortingEnabled(True)
+        info.sortItems(1, Qt.DescendingOrder)
+        info.resizeColumnToContents(0)
+
+    @Slot()
+    def expand(self, item):
+        """Adds the children of a directory the first time it is expanded"""
+        if item.childCount() > 0 or item.node < 0:
+            return
+        children = self.rollup.children(item.node).tolist()
+        item.addChildren([self.nodeItem_(x) for x in children])
+        info = self.info
+        item.sortChildren(info.sortColumn(), info.header().sortIndicatorOrder())
@@ -0,0 +1,119 @@
+"""
+Display the call sites of small allocations, the candidates for a
+pool allocator, grouped by function, line, file or stack.
+"""
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+from PySide6.QtCore import Slot, Qt
+from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QComboBox,
+    QHBoxLayout,
+    QLabel,
+    QSizePolicy,
+    QTableWidget,
+    QVBoxLayout,
+    QWidget,
+)
+from maltQtUtils import leftAlignedItem, numberItem, stackItem
+
+
+class MaltQtShortLived(QWidget):
+    """
+    Creates a widget ranking the call sites of small allocations, the
+    candidates for a pool allocator.  The sites can be grouped by
+    function, file, line or stack and the table sorted by any column.
+    """
+
+    groupings = ["function", "line", "file", "stack"]
+
+    def __init__(self, data):
+        # Initialize the widget
+        super().__init__()
+
+        # Squirrel away data
+        self.data = data
+        # fails if the profile has no lifetime statistics
+        data.shortLived(n=0)
+
+        self.groupBy = groupBy = QComboBox()
+        groupBy.addItems(self.groupings)
+        groupBy.currentTextChanged.connect(self.regroup)
+
+        self.info = info = QTableWidget()
+        size = QSizePolicy(QSizePolicy.Preferred, QSizePolicy.Preferred)
+        info.setSizePolicy(size)
+        info.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        info.setColumnCount(5)
+        info.setHorizontalHeaderLabels(
+            ["location", "allocs", "mean size (B)", "mean life (s)", "churn (MB)"]
+        )
+        info.setFont("Courier New")
+        info.horizontalHeaderItem(0).setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+        for col in range(1, 5):
+            info.horizontalHeaderItem(col).setTextAlignment(
+                Qt.AlignRight | Qt.AlignVCenter
+            )
+        info.horizontalHeader().setStretchLastSection(False)
+        info.setTextElideMode(Qt.ElideNone)
+
+        # Widgets are created, now lay them out
+        self.top_layout = QHBoxLayout()
+        self.top_layout.addWidget(
+            QLabel(f"Allocations of at most {data.shortLivedSize} bytes grouped by")
+        )
+        self.top_layout.addWidget(groupBy)
+        self.top_layout.addStretch()
+        self.main_layout = QVBoxLayout()
+        self.main_layout.addLayout(self.top_layout)
+        self.main_layout.addWidget(info)
+        self.setLayout(self.main_layout)
+
+        self.regroup(groupBy.currentText())
+
+    @Slot()
+    def regroup(self, groupBy):
+        """Fills the table with the call sites grouped by groupBy"""
+        data = self.data
+        sites = data.shortLived(groupBy)
+        info = self.info
+        info.setSortingEnabled(False)
+        info.clearContents()
+        info.setRowCount(len(sites["name"]))
+        for idx, (name, count, size, life, churn) in enumerate(
+            zip(
+                sites["name"],
+                sites["count"].tolist(),
+                sites["meanSize"].tolist(),
+                sites["meanLifetime"].tolist(),
+                sites["churn"].tolist(),
+            )
+        ):
+            if groupBy == "stack":
+                flatten = lambda stackId=name: data.flattenStackFromId(stackId)
+                info.setItem(idx, 0, stackItem(name, flatten))
+            else:
+                info.setItem(idx, 0, leftAlignedItem(name))
+            info.setItem(idx, 1, numberItem(count, f"{count:d}"))
+            info.setItem(idx, 2, numberItem(size, f"{size:.1f}"))
+            info.setItem(idx, 3, numberItem(life, f"{life:.3g}"))
+            info.setItem(idx, 4, numberItem(churn, f"{churn/1048576.:.3f}"))
+        info.setSortingEnabled(True)
+        info.sortItems(1, Qt.DescendingOrder)
+        info.resizeColumnsToContents()
@@ -82,7 +82,8 @@ class MaltQtStack(QTableWidget):
         if self.lastIndex != index:
             self.setRowCount(0)
             self.lastIndex = index
-            if stack is None or len(stack) < 2:
+            # unknown callsites come as [stackId] rather than a list of frames
+            if stack is None or len(stack) == 0 or type(stack[0]) != list:
                 self.setRowCount(1)
                 self.setRow(0, ["no stack", "??", "-1", "??"])
             else:
@@ -37,48 +37,94 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 from PySide6.QtCharts import QLineSeries
+from maltReaderLOD import MaltLOD
 from maltQtFile import MaltQtFile
 from maltQtStack import MaltQtStackView
 from maltQtChart import MaltQtChart, maltQChartView
 import re
+import numpy as np
 
 
 class MaltQtTimeline(QWidget):
     """Creates a timeline widget"""
 
-    def genSeries(self, label, idx, idy, values, scale=1.0):
-        """Given a x and y index into values returns a QLineSeries"""
+    # Scale of the memory columns of the chart (MB)
+    memScale = 1048576.0
+    # Wait for the next auto-repeated key before showing a stack (ms)
+    repeatDelay = 150
+
+    def genSeries(self, label):
+        """
+        Returns an empty QLineSeries, the points are filled in by
+        showSeries
+        """
         series = QLineSeries()
         series.setName(label)
-        idMax = idx if idx > idy else idy
-        lastX = values[0][idx]
-        lastY = values[0][idy]
-        for v in values:
-            if len(v) <= idMax:
-                series.append(lastX, lastY / scale)
-                continue
-            series.append(v[idx], v[idy] / scale)
-            lastX = v[idx]
-            lastY = v[idy]
         series.clicked.connect(self.click)
         return series
 
+    def showSeries(self):
+        """
+        Replaces the points of the series with those of the level of
+        detail that fits the visible time range, about two points per
+        pixel of the plot area
+        """
+        if len(self.time) == 0:
+            return
+        axes = self.chart.axes(QtCore.Qt.Horizontal)
+        if axes:
+            t0, t1 = axes[0].min(), axes[0].max()
+        else:
+            t0, t1 = float(self.time[0]), float(self.time[-1])
+        width = int(self.chart.plotArea().width())
+        maxPoints = 2 * width if width > 0 else 3000
+        low, high = np.inf, -np.inf
+        for series, y, idx in zip(
+            self.series, self.lod.ys, self.lod.query(t0, t1, maxPoints)
+        ):
+            xs = self.time[idx].tolist()
+            ys = y[idx] / self.memScale
+            series.replace([QtCore.QPointF(px, py) for px, py in zip(xs, ys.tolist())])
+            low, high = min(low, ys.min()), max(high, ys.max())
+
+        # fit the memory axis to the points in view
+        axes = self.chart.axes(QtCore.Qt.Vertical)
+        if axes and low <= high:
+            pad = 0.02 * (high - low) or 1.0
+            axes[0].setRange(float(low - pad), float(high + pad))
+
+    @QtCore.Slot()
+    def seriesChanged(self, *args):
+        """Reloads the series once the current batch of view changes is done"""
+        self.lodTimer.start(0)
+
     @QtCore.Slot()
     def click(self, p):
-        t = p.x()
-        idx = self.time.index(min(self.time, key=lambda x: abs(x - t)))
-        if idx != self.lastIndex:
+        idx = self.timeline.index(p.x())
+        if idx is not None and idx != self.lastIndex:
             self.markIndex = True
             self.memTableUpdate(idx)
-            self.chart.update()
             self.lastIndex = idx
 
+    def drag(self, p):
+        """
+        Moves to the point under the mouse while dragging.  Only the
+        last position of every frame is shown.
+        """
+        self.dragTime = p.x()
+        if not self.dTimer.isActive():
+            self.dTimer.start(16)
+
+    @QtCore.Slot()
+    def dragUpdate(self):
+        """Shows the point of the last drag position"""
+        self.click(QtCore.QPointF(self.dragTime, 0.0))
+
     def genString(self, idx):
-        v = self.values[idx]
-        t = v[self.idxT]
-        pMem = v[self.idxP] / 1048576.0
-        vMem = v[self.idxV] / 1048576.0
-        rMem = v[self.idxR] / 1048576.0
+        t = self.time[idx]
+        pMem = self.physical[idx] / 1048576.0
+        vMem = self.virtual[idx] / 1048576.0
+        rMem = self.requested[idx] / 1048576.0
         return f"{idx}:  t={t:.3f}, physical={pMem:.3f}MB, virtual={vMem:.3f}MB, requested={rMem:.3f}MB"
 
     def eventFilter(self, widget, event):
@@ -86,19 +132,38 @@ class MaltQtTimeline(QWidget):
             key = event.key()
             modifiers = QApplication.keyboardModifiers()
             shift = 10 if modifiers & QtCore.Qt.AltModifier else 1
-            if key == QtCore.Qt.Key_Left:
-                self.memTableUpdate(self.lastIndex - shift)
-                self.markIndex = True
-                self.chart.update()
+            if key == QtCore.Qt.Key_Home:
+                self.chart_view.resetZoom()
+                return True
+            elif key == QtCore.Qt.Key_Left and self.lastIndex is not None:
+                self.navigate(self.lastIndex - shift, event.isAutoRepeat())
                 return True
-            elif key == QtCore.Qt.Key_Right:
-                self.memTableUpdate(self.lastIndex + shift)
-                self.markIndex = True
-                self.chart.update()
+            elif key == QtCore.Qt.Key_Right and self.lastIndex is not None:
+                self.navigate(self.lastIndex + shift, event.isAutoRepeat())
                 return True
+        elif event.type() == QtCore.QEvent.KeyRelease and widget is self.chart_view:
+            # the arrow key is let go, show where we got to
+            if event.key() in (QtCore.Qt.Key_Left, QtCore.Qt.Key_Right):
+                if not event.isAutoRepeat():
+                    self.nTimer.start(0)
 
         return QWidget.eventFilter(self, widget, event)
 
+    def navigate(self, idx, repeat=False):
+        """
+        Moves to point idx from the keyboard.  Only the marker and the
+        memory information follow every key; the stack is shown once
+        the keys stop coming, so that held down keys never fall behind.
+        """
+        if self.infoUpdate_(idx) is None:
+            return
+        self.nTimer.start(self.repeatDelay if repeat else 0)
+
+    @QtCore.Slot()
+    def navigateDone(self):
+        """Shows the stack of the point the keyboard got to"""
+        self.memTableUpdate(self.lastIndex)
+
     def rightAlignedItem(self, theText):
         """Returns a right aligned table item"""
         item = QTableWidgetItem(theText)
@@ -130,33 +195,42 @@ class MaltQtTimeline(QWidget):
         theFile = item[1]
         self.fileArea.loadFile(theFile, theLine, {})
 
-    def memTableUpdate(self, idx):
-        """Updates the information in the memory table"""
+    def infoUpdate_(self, idx):
+        """
+        Moves the marker to point idx and updates the memory
+        information, returns the index clamped to the timeline or
+        None if the timeline has no points
+        """
+        if idx is None or len(self.time) == 0:
+            return None
         if idx < 0:
             idx = 0
-        elif idx >= len(self.values):
-            idx = len(self.values) - 1
-        v = self.values[idx]
-        if len(v) < self.idxMax:
-            tIdx = t = pMem = vMem = rMem = "??"
-        else:
-            tIdx = f"{idx}"
-            t = f"{v[self.idxT]:.3f}"
-            pMem = f"{v[self.idxP] / 1048576.0:.3f}"
-            vMem = f"{v[self.idxV] / 1048576.0:.3f}"
-            rMem = f"{v[self.idxR] / 1048576.0:.3f}"
+        elif idx >= len(self.time):
+            idx = len(self.time) - 1
+        tIdx = f"{idx}"
+        t = f"{self.time[idx]:.3f}"
+        pMem = f"{self.physical[idx] / 1048576.0:.3f}"
+        vMem = f"{self.virtual[idx] / 1048576.0:.3f}"
+        rMem = f"{self.requested[idx] / 1048576.0:.3f}"
         self.lastIndex = idx
-        self.stack_view.updateStack(self.stacks[idx], idx)
-        self.stack = self.stacks[idx]
-        self.row = 0
-        self.fTimer.start(250)
         self.markIndex = True
-        self.chart.update()
+        self.chart_view.showMarker()
         self.info.setItem(0, 0, self.rightAlignedItem(t))
         self.info.setItem(1, 0, self.rightAlignedItem(pMem))
         self.info.setItem(2, 0, self.rightAlignedItem(vMem))
         self.info.setItem(3, 0, self.rightAlignedItem(rMem))
         self.info.setItem(4, 0, self.rightAlignedItem(tIdx))
+        return idx
+
+    def memTableUpdate(self, idx):
+        """Updates the information in the memory table"""
+        idx = self.infoUpdate_(idx)
+        if idx is None:
+            return
+        self.stack = self.timeline.stack(idx)
+        self.stack_view.updateStack(self.stack, idx)
+        self.row = 0
+        self.fTimer.start(250)
 
     def __init__(self, parent, data):
         # Initialize the widget
@@ -172,30 +246,36 @@ class MaltQtTimeline(QWidget):
         # Squirrel away data
         self.data = data
 
-        # Create series for timeline
-        timeline = self.data.getAnnotatedTimeline()
-        values = self.values = timeline["values"]
-        fields = timeline["fields"]
-        idxT = self.idxT = fields.index("t")
-        idxS = self.idxS = fields.index("stack")
-        idxP = self.idxP = fields.index("physicalMem")
-        idxR = self.idxR = fields.index("requestedMem")
-        idxV = self.idxV = fields.index("virtualMem")
-        self.idxMax = len(fields)
-        self.time = [x[idxT] if idxT < len(x) else -1.0 for x in values]
-        self.pMem = self.genSeries("Physical Memory(MB)", idxT, idxP, values, 1048576.0)
-        self.rMem = self.genSeries(
-            "Requested Memory(MB)", idxT, idxR, values, 1048576.0
-        )
-        self.vMem = self.genSeries("Virtual Memory(MB)", idxT, idxV, values, 1048576.0)
-        self.stacks = [x[idxS] if idxS < len(x) else [["??", "??", -1]] for x in values]
+        # Create series for timeline, stacks are resolved as they are shown
+        timeline = self.timeline = self.data.timeline
+        time = self.time = timeline.time
+        physical = self.physical = timeline.column("physicalMem")
+        requested = self.requested = timeline.column("requestedMem")
+        virtual = self.virtual = timeline.column("virtualMem")
+        self.pMem = self.genSeries("Physical Memory(MB)")
+        self.rMem = self.genSeries("Requested Memory(MB)")
+        self.vMem = self.genSeries("Virtual Memory(MB)")
+        self.series = [self.pMem, self.rMem, self.vMem]
+        # Only the points that show at the current zoom are drawn
+        self.lod = MaltLOD(time, [physical, requested, virtual])
 
         self.chart = MaltQtChart(self)
+        self.showSeries()
         self.chart.addSeries(self.pMem)
         self.chart.addSeries(self.rMem)
         self.chart.addSeries(self.vMem)
         self.chart.createDefaultAxes()
 
+        # Reload the points when the time range or the plot area
+        # change, once per batch of changes
+        self.lodTimer = lodTimer = QtCore.QTimer()
+        lodTimer.setSingleShot(True)
+        lodTimer.timeout.connect(self.showSeries)
+        self.chart.axes(QtCore.Qt.Horizontal)[0].rangeChanged.connect(
+            self.seriesChanged
+        )
+        self.chart.plotAreaChanged.connect(self.seriesChanged)
+
         # Create a filew view area
         self.fileArea = MaltQtFile()
 
@@ -295,6 +375,11 @@ class MaltQtTimeline(QWidget):
         Keeping Alt key pressed while pressing arrow keys will
         increase / decrease the index by 10 instead of 1.
 
+        Zoom in and out of the timeline with the mouse wheel, or drag
+        with the right mouse button over the times to zoom in to; a
+        right click zooms out.  Drag with the middle mouse button or
+        Shift-drag to pan and hit "Home" to see the whole timeline.
+
         Also check out the search box below for identifying specific
         routines or files.  Use "Tab" to switch back and forth between
         the chart and the search box.
@@ -327,6 +412,17 @@ class MaltQtTimeline(QWidget):
         fTimer.setSingleShot(True)
         fTimer.timeout.connect(self.fileShow)
 
+        # Held down arrow keys only show the stack once they stop
+        self.nTimer = nTimer = QtCore.QTimer()
+        nTimer.setSingleShot(True)
+        nTimer.timeout.connect(self.navigateDone)
+
+        # Drags are shown at most once per frame
+        self.dragTime = None
+        self.dTimer = dTimer = QtCore.QTimer()
+        dTimer.setSingleShot(True)
+        dTimer.timeout.connect(self.dragUpdate)
+
         self.stack_view.setFocusPolicy(QtCore.Qt.NoFocus)
         self.info.setFocusPolicy(QtCore.Qt.NoFocus)
         self.ifilter = 0
@@ -350,17 +446,22 @@ class MaltQtTimeline(QWidget):
                 self.filterNext()
             return
         self.lastText = text
-        self.filterIds = []
         reFilter = re.compile(text, re.IGNORECASE)
-        for idx, s in enumerate(self.stacks):
-            for entry in s:
+        # search every callsite once rather than every point
+        timeline = self.timeline
+        found = np.zeros(len(timeline.siteIds), dtype=bool)
+        for s in np.unique(timeline.site).tolist():
+            for entry in timeline.siteStack(s):
+                if type(entry) != list:
+                    continue
                 m = reFilter.search(entry[0])
                 if m is None:
                     n = reFilter.search(entry[1])
                     if n is None:
                         continue
-                self.filterIds.append(idx)
+                found[s] = True
                 break
+        self.filterIds = np.flatnonzero(found[timeline.site]).tolist()
         if len(self.filterIds) == 0:
             self.prevB.setEnabled(False)
             self.nextB.setEnabled(False)
@@ -35,6 +35,41 @@ def leftAlignedItem(theText):
     return item
 
 
+class numberItem(QTableWidgetItem):
+    """
+    A right aligned table item showing theText that sorts by value
+    rather than by text
+    """
+
+    def __init__(self, value, theText):
+        super().__init__(theText)
+        self.value = value
+        self.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+    def __lt__(self, other):
+        if isinstance(other, numberItem):
+            return self.value < other.value
+        return super().__lt__(other)
+
+
+class stackItem(QTableWidgetItem):
+    """
+    A left aligned table item whose tool tip is the flattened stack
+    returned by flatten().  The stack is only flattened when the tool
+    tip is shown.
+    """
+
+    def __init__(self, theText, flatten):
+        super().__init__(theText)
+        self.flatten = flatten
+        self.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+
+    def data(self, role):
+        if role == Qt.ToolTipRole:
+            return self.flatten().replace("< ", "\n< ").strip()
+        return super().data(role)
+
+
 def fileSelect(
     parent,
     caption="Select File",
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+"""
+A binary sidecar cache of a parsed and indexed MALT profile.
+
+  MaltCache(fname, settings=None):
+       fname: The MALT JSON file being cached.  The cache lives next
+              to it as <base>.<hash>.maltcache, where hash is taken
+              from settings, so that each set of filter rules has a
+              cache of its own
+    settings: The (JSON serializable) filter settings used to build
+              the cached data
+
+  The cache is keyed by the absolute path, size and modification time
+  of the JSON file as well as the filter settings and the Python
+  version.  A cache whose key does not match is ignored and rewritten.
+
+  File layout:
+     8 bytes: magic
+     8 bytes: little endian length of the header
+      header: JSON dictionary {"key": {...}, "sections": {...}}
+    sections: each section starts on a 64 byte boundary
+
+  The file is memory mapped and a section is only decoded the first
+  time it is asked for, so a tab that never touches the leaks (say)
+  never pays for loading them.  NumPy arrays are stored as raw bytes
+  and come back as read-only arrays backed directly by the mapping;
+  everything else is stored with marshal.
+
+Methods:
+   load():
+     Returns True if a valid cache exists.  Sections are then read on
+     demand with section(name).
+
+   save(sections):
+     Writes the dictionary of sections {name: value} to the cache.
+
+   share(sections):
+     Lays the sections out exactly as save() does, but in a new block
+     of shared memory which is returned.  Another process rebuilds the
+     profile from it with attach(name) without copying or unpickling
+     the arrays (see maltReaderPool.py).
+
+   attach(name):
+     Maps the shared memory block name written by share() in place of
+     the cache file and unlinks it, so the block goes away once this
+     cache is closed.
+"""
+
+import os
+import sys
+import mmap
+import json
+import struct
+import marshal
+import hashlib
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+CACHE_MAGIC = b"MALTQTC\0"
+CACHE_VERSION = 11
+CACHE_ALIGN = 64
+
+
+class SharedBlock(SharedMemory):
+    """
+    Shared memory whose mapping is released along with the last array
+    using it, rather than being closed (and failing) when the block
+    object is collected.
+    """
+
+    def __del__(self):
+        pass
+
+
+class MaltCache:
+    def __init__(self, fname, settings=None):
+        self.fname = fname
+        digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode())
+        base = os.path.splitext(fname)[0]
+        self.cacheName = f"{base}.{digest.hexdigest()[:12]}.maltcache"
+        stat = os.stat(fname)
+        self.key = {
+            "version": CACHE_VERSION,
+            "python": list(sys.version_info[:2]),
+            "path": os.path.abspath(fname),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "settings": settings,
+        }
+        self.sections = {}
+        self.loaded = {}
+        self.mm = None
+        self.shm = None
+
+    def load(self):
+        """Maps the cache file and reads its header"""
+        try:
+            with open(self.cacheName, "rb") as fp:
+                self.mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            header = self.readHeader_()
+            if header["key"] != self.key:
+                raise ValueError("stale cache")
+            self.sections = header["sections"]
+        except (OSError, ValueError, KeyError, struct.error):
+            self.close()
+            return False
+        print(f"Using cache {self.cacheName}")
+        return True
+
+    def attach(self, name):
+        """Maps the shared memory block name and reads its header"""
+        self.shm = SharedBlock(name)
+        # nobody else needs the name, the mapping lives on until closed
+        self.shm.unlink()
+        self.mm = self.shm.buf
+        header = self.readHeader_()
+        self.key = header["key"]
+        self.sections = header["sections"]
+
+    def readHeader_(self):
+        if self.mm[: len(CACHE_MAGIC)] != CACHE_MAGIC:
+            raise ValueError("not a cache file")
+        start = len(CACHE_MAGIC) + 8
+        (length,) = struct.unpack("<Q", self.mm[len(CACHE_MAGIC) : start])
+        return json.loads(bytes(self.mm[start : start + length]))
+
+    def close(self):
+        self.sections = {}
+        self.loaded = {}
+        if self.shm is not None:
+            self.mm = None
+            self.shm.close()
+            self.shm = None
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    def section(self, name):
+        """Decodes a section on first use and returns it"""
+        if name not in self.loaded:
+            entry = self.sections[name]
+            offset, length = entry[:2]
+            if len(entry) > 2:
+                dtype, shape = np.dtype(entry[2]), entry[3]
+                value = np.frombuffer(
+                    self.mm, dtype, length // dtype.itemsize, offset
+                ).reshape(shape)
+            else:
+                value = marshal.loads(self.mm[offset : offset + length])
+            self.loaded[name] = value
+        return self.loaded[name]
+
+    def pack_(self, sections):
+        """
+        Returns the header, the (offset, blob) pairs of the sections and
+        the total size of the cache layout of sections
+        """
+        blobs = {}
+        table = {}
+        for name, value in sections.items():
+            if isinstance(value, np.ndarray):
+                value = np.ascontiguousarray(value)
+                blobs[name] = memoryview(value.reshape(-1)).cast("B")
+                table[name] = [0, value.nbytes, value.dtype.str, list(value.shape)]
+            else:
+                blobs[name] = marshal.dumps(value)
+                table[name] = [0, len(blobs[name])]
+
+        # The header holds the offsets, so size it before placing sections
+        header = json.dumps({"key": self.key, "sections": table}).encode()
+        offset = len(CACHE_MAGIC) + 8 + len(header) + 32 * len(table)
+        for name, blob in blobs.items():
+            offset += -offset % CACHE_ALIGN
+            table[name][0] = offset
+            offset += len(blob)
+        header = json.dumps({"key": self.key, "sections": table}).encode()
+        placed = [(table[name][0], blob) for name, blob in blobs.items()]
+        return header, placed, offset
+
+    def save(self, sections):
+        """Writes the sections to the cache file"""
+        header, blobs, _ = self.pack_(sections)
+        tmpName = self.cacheName + ".tmp"
+        try:
+            with open(tmpName, "wb") as fp:
+                fp.write(CACHE_MAGIC)
+                fp.write(struct.pack("<Q", len(header)))
+                fp.write(header)
+                for offset, blob in blobs:
+                    fp.write(b"\0" * (offset - fp.tell()))
+                    fp.write(blob)
+            os.replace(tmpName, self.cacheName)
+        except OSError as e:
+            print(f"Unable to write cache {self.cacheName}: {e}")
+            return False
+        print(f"Wrote cache {self.cacheName}")
+        return True
+
+    def share(self, sections):
+        """Writes the sections to a new shared memory block"""
+        header, blobs, size = self.pack_(sections)
+        shm = SharedMemory(create=True, size=size)
+        buf = shm.buf
+        start = len(CACHE_MAGIC) + 8
+        buf[: len(CACHE_MAGIC)] = CACHE_MAGIC
+        buf[len(CACHE_MAGIC) : start] = struct.pack("<Q", len(header))
+        buf[start : start + len(header)] = header
+        for offset, blob in blobs:
+            buf[offset : offset + len(blob)] = blob
+        del buf
+        return shm
+
+
+class MaltCacheData(dict):
+    """
+    Stands in for the raw JSON dictionary of a reader that was loaded
+    from the cache.  The sections are pulled from the cache the first
+    time they are looked up.
+    """
+
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+
+    def __missing__(self, key):
+        cache = self.cache
+        if key == "stacks":
+            # the stacks themselves live in the reader's stack table
+            value = {}
+        elif key == "sites":
+            value = {
+                "strings": cache.section("names"),
+                "instr": cache.section("instr"),
+            }
+        elif key in ("globals", "leaks"):
+            value = cache.section(key)
+        else:
+            raise KeyError(key)
+        self[key] = value
+        return value
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+"""
+Buffered CSV export.
+
+  MaltCSVWriter(fname, header, blockRows=65536):
+         fname: The file to write.  None writes to stdout, a name
+                ending in ".gz" is gzip compressed and one ending in
+                ".zst" is zstd compressed (this needs Python 3.14 or
+                the zstandard package).
+        header: The first line of the file, without the newline
+     blockRows: Number of rows formatted and written at a time
+
+  The writer is a context manager that closes the file (but never
+  stdout) on exit.
+
+Methods:
+   write(fmt, *columns):
+     Writes one row per entry of the columns (NumPy arrays or lists of
+     equal length).  fmt is the %-format of a row, e.g. '%.3f,"%s"\\n'.
+     Rows are formatted a block at a time from whole columns, so only
+     one block of text is ever held in memory however long the columns.
+
+  runConcurrently(jobs):
+    Runs the list of (function, args) jobs in threads and waits for
+    them, raising the first error.  Compression and file output run
+    without holding the GIL and overlap with the formatting.
+"""
+
+import sys
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+
+def openText_(fname):
+    """Opens fname for writing text, compressing it if its name asks"""
+    if fname.endswith(".gz"):
+        return gzip.open(fname, "wt", compresslevel=6)
+    if fname.endswith(".zst"):
+        if zstd is None:
+            raise ValueError(
+                f"Unable to write {fname}: zstd output needs Python 3.14 or "
+                "the zstandard package"
+            )
+        return zstd.open(fname, "wt")
+    return open(fname, "w")
+
+
+class MaltCSVWriter:
+    def __init__(self, fname, header, blockRows=1 << 16):
+        self.fname = fname
+        self.blockRows = blockRows
+        self.fp = sys.stdout if fname is None else openText_(fname)
+        self.fp.write(header + "\n")
+
+    def write(self, fmt, *columns):
+        """Writes the columns, one row per entry, with the format fmt"""
+        fp = self.fp
+        n = len(columns[0])
+        for start in range(0, n, self.blockRows):
+            block = [
+                (
+                    column[start : start + self.blockRows].tolist()
+                    if isinstance(column, np.ndarray)
+                    else column[start : start + self.blockRows]
+                )
+                for column in columns
+            ]
+            fp.write("".join(map(fmt.__mod__, zip(*block))))
+
+    def close(self):
+        if self.fname is not None:
+            self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def runConcurrently(jobs):
+    """Runs the (function, args) jobs in threads"""
+    with ThreadPoolExecutor(max(len(jobs), 1)) as pool:
+        futures = [pool.submit(function, *args) for function, args in jobs]
+        for future in futures:
+            future.result()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+"""
+Rule driven filtering of stack frames.
+
+  MaltFilter(rules=None, allocators=True):
+         rules: A list of rules (see below)
+    allocators: If True, starts with the "@allocators" preset which
+                strips malloc, calloc, realloc, posix_memalign,
+                "operator new(unsigned long)", "__gnu_cxx::" and
+                libstdc++ frames.
+
+  A rule is a string "[+|!]field:regex" where field is one of
+  function, file or library (the binary holding the code) and regex is
+  searched for in that name.  Rules starting with "!" (the default)
+  exclude matching frames.  Rules starting with "+" include frames: if
+  there are any include rules, only frames matching at least one of
+  them are kept.  "@name" adds the preset rules in filterPresets, e.g.
+  "@jemalloc", "@tcmalloc" or "@kokkos".
+
+  Removing a frame ascribes its memory to its caller.  Frames whose
+  address is missing from the instr table are never removed.
+
+Methods:
+   add(rules):
+     Adds a list of rules.
+
+   settings():
+     Returns the rules as a list of strings, e.g. for cache keys.
+
+   mask(table):
+     Compiles the rules against the name tables of a MaltInstrTable
+     and returns a boolean array flagging the addresses to remove.
+"""
+
+import re
+
+import numpy as np
+
+filterPresets = {
+    "allocators": [
+        r"!function:^(calloc|malloc|posix_memalign|realloc)$",
+        r"!function:^operator new\(unsigned long\)$",
+        r"!function:^__gnu_cxx::",
+        r"!function:./libstdc\+\+/",
+    ],
+    "jemalloc": [
+        r"!function:^(je_|_?mallocx|rallocx|sdallocx|xallocx)",
+        r"!library:libjemalloc",
+    ],
+    "tcmalloc": [
+        r"!function:^(tc_|tcmalloc::)",
+        r"!library:libtcmalloc",
+    ],
+    "kokkos": [
+        r"!function:^Kokkos::kokkos_(malloc|realloc)",
+        r"!function:^Kokkos::\w*Space::(impl_)?allocate",
+        r"!function:^Kokkos::Impl::SharedAllocationRecord<",
+    ],
+}
+
+
+class MaltFilter:
+    fields = ("function", "file", "library")
+
+    def __init__(self, rules=None, allocators=True):
+        self.rules = []
+        if allocators:
+            self.add(["@allocators"])
+        if rules is not None:
+            self.add(rules)
+
+    def add(self, rules):
+        """Adds rules of the form [+|!]field:regex or @preset"""
+        for rule in rules:
+            if rule.startswith("@"):
+                if rule[1:] not in filterPresets:
+                    raise ValueError(f"Unknown filter preset '{rule}'")
+                self.add(filterPresets[rule[1:]])
+                continue
+            include = rule.startswith("+")
+            body = rule[1:] if rule[:1] in ("+", "!") else rule
+            field, sep, pattern = body.partition(":")
+            if field not in self.fields or len(sep) == 0:
+                raise ValueError(
+                    f"Filter rule '{rule}' is not of the form [+|!]field:regex"
+                    f" with field one of {', '.join(self.fields)}"
+                )
+            self.rules.append((include, field, re.compile(pattern)))
+
+    def settings(self):
+        return [
+            f"{'+' if include else '!'}{field}:{regex.pattern}"
+            for include, field, regex in self.rules
+        ]
+
+    def mask(self, table):
+        """Returns a boolean array flagging the addresses to remove"""
+        n = len(table.addrs)
+        # library ids of -1 pick up the trailing "no library" entry
+        names = {
+            "function": (table.fullNames, table.fullId),
+            "file": (table.files, table.fileId),
+            "library": (table.binaries, table.binaryId),
+        }
+        remove = np.zeros(n, dtype=bool)
+        included = np.zeros(n, dtype=bool)
+        hasInclude = False
+        for include, field, regex in self.rules:
+            strings, ids = names[field]
+            matches = np.zeros(len(strings) + 1, dtype=bool)
+            matches[:-1] = [regex.search(x) is not None for x in strings]
+            if include:
+                hasInclude = True
+                included |= matches[ids]
+            else:
+                remove |= matches[ids]
+        if hasInclude:
+            remove |= ~included
+        return remove & table.known
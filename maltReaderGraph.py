@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+
+"""
+The function-level call graph of a MALT profile.
+
+  MaltCallGraph.fromFrames(rows, funcs, stacks, funcNames):
+         rows: Stack table row of every frame (see frameColumns_ of
+               maltReaderJSON.py)
+        funcs: Function id of every frame
+       stacks: The MaltStackTable
+    funcNames: Names of the function ids
+    Every pair of adjacent frames of a stack is a call from the outer
+    function (the caller) to the inner one (the callee), weighted by
+    the count, sum and globalPeak of the stack.  An edge is credited
+    once per stack however often a recursion repeats it.
+
+Data Members:
+        caller: Caller function id of every edge
+        callee: Callee function id of every edge
+       weights: Matrix with one row per edge and one column per metric
+                (count, sum, globalPeak)
+  calleeOffsets: The edges from function f are
+                 calleeOffsets[f]:calleeOffsets[f+1] (edges are sorted
+                 by caller, then callee)
+      byCallee: Edges sorted by callee, then caller
+  callerOffsets: The edges to function f are
+                 byCallee[callerOffsets[f]:callerOffsets[f+1]]
+
+Methods:
+   callees(f):
+     Returns the functions called by f and the weights of those edges.
+
+   callers(f):
+     Returns the functions calling f and the weights of those edges.
+
+   weight(caller, callee, metric):
+     Returns the metric of an edge, 0 if there is no such call.
+
+   funcId(name):
+     Returns the function id of name, or -1.
+"""
+
+import numpy as np
+
+
+class MaltCallGraph:
+    metrics = ("count", "sum", "globalPeak")
+    sectionNames = [
+        "caller",
+        "callee",
+        "weights",
+        "calleeOffsets",
+        "byCallee",
+        "callerOffsets",
+    ]
+
+    def __init__(
+        self,
+        funcNames,
+        caller,
+        callee,
+        weights,
+        calleeOffsets,
+        byCallee,
+        callerOffsets,
+    ):
+        self.funcNames = funcNames
+        self.caller = caller
+        self.callee = callee
+        self.weights = weights
+        self.calleeOffsets = calleeOffsets
+        self.byCallee = byCallee
+        self.callerOffsets = callerOffsets
+        self.funcIds = None
+
+    @classmethod
+    def fromFrames(cls, rows, funcs, stacks, funcNames):
+        """Builds the call graph from the frame columns of the stacks"""
+        funcs = funcs.astype(np.int64)
+        # frames are innermost first, the next frame is the caller
+        adjacent = np.flatnonzero(rows[1:] == rows[:-1])
+        edges = funcs[adjacent + 1] << 32 | funcs[adjacent]
+        edgeRows = rows[adjacent]
+
+        # keep every edge once per stack, then sum the stacks of an edge
+        order = np.lexsort((edgeRows, edges))
+        edges = edges[order]
+        edgeRows = edgeRows[order]
+        keep = np.ones(len(edges), dtype=bool)
+        keep[1:] = (edges[1:] != edges[:-1]) | (edgeRows[1:] != edgeRows[:-1])
+        edges = edges[keep]
+        edgeRows = edgeRows[keep]
+        first = np.ones(len(edges), dtype=bool)
+        first[1:] = edges[1:] != edges[:-1]
+        starts = np.flatnonzero(first)
+        perStack = np.stack(
+            [getattr(stacks, metric)[edgeRows] for metric in cls.metrics], axis=1
+        )
+        if len(starts) > 0:
+            weights = np.add.reduceat(perStack, starts)
+        else:
+            weights = np.zeros((0, len(cls.metrics)), dtype=np.int64)
+        caller = (edges[starts] >> 32).astype(np.int32)
+        callee = (edges[starts] & 0xFFFFFFFF).astype(np.int32)
+
+        n = len(funcNames)
+        calleeOffsets = np.searchsorted(caller, np.arange(n + 1))
+        byCallee = np.lexsort((caller, callee))
+        callerOffsets = np.searchsorted(callee[byCallee], np.arange(n + 1))
+        return cls(
+            funcNames,
+            caller,
+            callee,
+            weights,
+            calleeOffsets,
+            byCallee,
+            callerOffsets,
+        )
+
+    def __len__(self):
+        return len(self.caller)
+
+    def funcId(self, name):
+        """Returns the function id of name"""
+        if self.funcIds is None:
+            self.funcIds = {x: i for i, x in enumerate(self.funcNames)}
+        return self.funcIds.get(name, -1)
+
+    def callees(self, f):
+        """Returns the callees of f and the weights of the edges"""
+        edges = slice(self.calleeOffsets[f], self.calleeOffsets[f + 1])
+        return self.callee[edges], self.weights[edges]
+
+    def callers(self, f):
+        """Returns the callers of f and the weights of the edges"""
+        edges = self.byCallee[self.callerOffsets[f] : self.callerOffsets[f + 1]]
+        return self.caller[edges], self.weights[edges]
+
+    def weight(self, caller, callee, metric):
+        """Returns the metric of the edge from caller to callee"""
+        start, end = self.calleeOffsets[caller], self.calleeOffsets[caller + 1]
+        i = start + int(np.searchsorted(self.callee[start:end], callee))
+        if i == end or self.callee[i] != callee:
+            return 0
+        return int(self.weights[i, self.metrics.index(metric)])
+
+    def toSections(self):
+        return {name: getattr(self, name) for name in self.sectionNames}
+
+    @classmethod
+    def fromSections(cls, get, reader):
+        return cls(
+            reader.instrTable.funcNames, *[get(name) for name in cls.sectionNames]
+        )
@@ -19,13 +19,32 @@
 
 """
 Reads in a MALT JSON file and provides a human-traversable
-  MaltReaderJSON(fname, filterBy=None):
+  MaltReaderJSON(fname, filterBy=None, stream=False, cache=True, rules=None,
+                 distinct=False):
        fname: The name of JSON file to parse, required
     filterBy: A top level filter for including only entities whose
               source file name contains this string.
+       rules: A list of additional filter rules "[+|!]field:regex" or
+              presets "@name" (see maltReaderFilter.py).  Allocator
+              frames (malloc, operator new, ...) are always removed.
+      stream: If True, the file is parsed incrementally (see
+              maltReaderStream.py) and only the sections used by the
+              reader are kept.  Use this for multi-GB profiles.
+       cache: If True, the parsed and indexed profile is read from
+              (or written to) a sidecar file next to fname (see
+              maltReaderCache.py).  Sections of a cached profile are
+              only loaded when they are first used.
+    distinct: If True, inclusive memory, counts and global peak are
+              credited once per stack to every distinct function and
+              (file, line) of the stack, so a recursive function is
+              not counted again for every level of the recursion.
+              Otherwise every frame is credited.
 
 Data Members of dictionary returned:
-          data: Raw JSON data
+          data: Raw JSON data (only the sections used by the reader
+                when stream is True).  stacks.stats is moved into
+                self.stacks and timeline.memoryTimeline into
+                self.timeline while reading.
          names: data["sites"]["strings"] array that holds the
                      names of all entities in the program
          instr: data["sites"]["instr"] array that holds indices into self.names for file, function, and line#
@@ -33,6 +52,15 @@ Data Members of dictionary returned:
                 function names
        nameMap: A lookup from function name to addresses of interest
                 inside that function.
+    instrTable: Dense integer ids for every address with separate
+                function, file and binary tables (see
+                maltReaderTables.py)
+        stacks: All stacks as CSR arrays of address ids along with
+                their counts, sums and global peaks
+      callsite: A lookup from stack id to the list of addresses of
+                that stack for all stacks that carry memory
+      timeline: The memory timeline as NumPy columns with the stacks
+                resolved on demand (see maltReaderTimeline.py)
          count: Dictionary with function names for keys and allocation
                 counts for values
      exclusive: Dictionary with function names for keys and exclusive
@@ -41,6 +69,24 @@ Data Members of dictionary returned:
                 allocated memory for values
    globalPeaks: Dictionary with function names for keys and
                 [inclusive@Peak, exclusive@Peak] memory for values
+     callGraph: The function-level call graph with the count, sum
+                and globalPeak of every caller/callee edge (see
+                maltReaderGraph.py)
+     leakTable: The leaks interned by stack and aggregated by top
+                frame, function, file:line or stack (see
+                maltReaderLeaks.py)
+        rollup: The inclusive, exclusive, global peak and leaked memory
+                of every file, directory, project root and library
+                (see maltReaderRollup.py)
+      callTree: The calling-context tree of the stacks and leaks with
+                inclusive and exclusive totals per call path (see
+                maltReaderTree.py), built the first time it is used
+         ranks: For a profile merged from the files of several MPI
+                ranks (see maltReaderMerge.py), the list of those
+                files, otherwise None
+     rankStats: For a merged profile, the per-stack min, mean, max
+                and argmax rank of the sum and globalPeak of the
+                stacks over the ranks, otherwise None
 
 Methods:
    allocsByName(self, name, exclusive=False):
@@ -49,17 +95,79 @@ Methods:
      is set to True, this function returns only exclusive allocations
      are returned. 
 
+   searchByName(self, name=None, exclusive=False):
+     Same as allocsByName, but returns the matching function names,
+     their allocated memory and count as three arrays sorted by
+     memory, largest first.  Both searches go through self.nameIndex,
+     a trigram index of the function names built at load time (see
+     maltReaderNames.py), so the regular expression only runs on the
+     names that can match.
+
+   stackInfo(self, stackId):
+     Returns all the numeric fields of the MALT infos record of
+     stackId (alloc.count, free.sum, lifetime.max, maxAliveReq, ...)
+     as a dictionary.  The fields of all the stacks are kept as
+     columns in self.stacks (see infoFields and infos in
+     maltReaderTables.py).
+
+   shortLived(self, groupBy="function", sortBy="count", maxSize=None,
+              n=None):
+     Returns the call sites of small allocations (a mean size of at
+     most maxSize bytes, shortLivedSize if None), grouped by
+     function, file, line or stack of the top frame of their stacks,
+     as a dictionary of arrays with keys name, count (number of
+     allocations), meanSize, meanLifetime (in seconds, inf if nothing
+     was freed) and churn (count times mean size, the bytes cycled
+     through the allocator).  The n first (all if n is None) are
+     returned, sorted by count or churn, largest first, or by
+     meanLifetime, shortest first.  These are the places where a pool
+     allocator helps most.
+
+   topN(self, metric="sum", n=10, exclusive=False, groupBy="function"):
+     Returns the names and values (an array) of the n groups with the
+     largest total of metric (count, sum, globalPeak or any field of
+     stacks.infoFields, e.g. free.count or lifetime.max), largest
+     first.  Minima and maxima of the infos fields are combined as
+     such rather than summed.  groupBy is one of function, file, line
+     ("file:line") or stack (stack ids).  With exclusive set only the
+     top frame of a stack is credited (this has no effect on stack).
+     The totals are computed once and kept in self.aggregates; the
+     top entries are picked with a partial selection rather than a
+     full sort.
+
+   callersOf(self, name, metric="sum"):
+   calleesOf(self, name, metric="sum"):
+     Returns the functions calling (called by) function name and the
+     metric of those calls as two lists, largest first.
+
+   underPath(self, path, metric="sum", exclusive=False):
+     Returns the inclusive (exclusive) metric (count, sum, globalPeak,
+     leaks or leakCount) of the stacks through the call path, a list
+     of addresses outermost first, or 0 if no stack has that path.
+
+   childrenOf(self, path, metric="sum"):
+     Returns the addresses called from the call path and their
+     inclusive metric as two lists, largest first.  Both queries
+     walk self.callTree.
+
    flattenStack(self, stack):
      Given a stack list will return a string with line and function
      numbers "< line:func1 < line:func2 < ...".
 
    flattenStackFromId(self, stackId):
      Given a stack ID, returns the flattened stack for that stack Id.
-     Calls flattenStack to do flattening. 
+     Flattened stacks are kept in self.flatStacks, a least recently
+     used cache of at most flatStackBytes (see maltReaderLRU.py).
+
+   annotatedStackFromId(self, stackId):
+     Given a stack ID, returns the stack as a list of instrMap entries,
+     or [stackId] if the stack is unknown or has no frames left after
+     filtering.
 
    getAnnotatedTimeline(self):
      Returns the timeline as a dictionary with real time in seconds
-     and a flattened stack added to the data. 
+     and a flattened stack added to the data.  This builds a list for
+     every point, use self.timeline instead where possible.
 
    dumpTimeline(self, fname):
      Dumps timeline to CSV file with real time in seconds and
@@ -74,39 +182,185 @@ Methods:
      Dumps Leaks to CSV file with stacks added.  If fname is None,
      output is sent to stdout.
 
+     The dumps write their rows a block at a time (see
+     maltReaderExport.py), and a file name ending in ".gz" or ".zst"
+     is compressed.
+
+   dumpAll(self, base, suffix=".csv"):
+     Runs the three dumps above at the same time to the files
+     base_timeline, base_globalPeak and base_leaks followed by suffix.
+
 """
 
 import re
 import json
+import numpy as np
+from maltReaderStream import readMaltStream
+from maltReaderCache import MaltCache, MaltCacheData
+from maltReaderFilter import MaltFilter
+from maltReaderLRU import MaltLRUCache
+from maltReaderExport import MaltCSVWriter, runConcurrently
+from maltReaderTables import (
+    MaltCallsites,
+    MaltInstrTable,
+    MaltStackTable,
+    firstPerRow,
+    foldInfos,
+    groupSums,
+    infoFold,
+    topIndices,
+    reDemangle,
+)
+from maltReaderTimeline import MaltTimeline
+from maltReaderNames import MaltNameIndex
+from maltReaderTree import MaltCallTree, NO_NODE
+from maltReaderLeaks import MaltLeakTable
+from maltReaderRollup import MaltRollup
+from maltReaderGraph import MaltCallGraph
 
 
 class MaltReaderJSON:
-    def __init__(self, fname, filterBy=None):
+    # Members that are stored in the cache and loaded lazily from it
+    cachedMembers = [
+        "names",
+        "instr",
+        "leaks",
+        "instrMap",
+        "nameMap",
+        "fileAlloc",
+        "count",
+        "inclusive",
+        "exclusive",
+        "globalPeak",
+        "distinct",
+    ]
+    cachedTables = {
+        "instrTable": MaltInstrTable,
+        "stacks": MaltStackTable,
+        "callsite": MaltCallsites,
+        "timeline": MaltTimeline,
+        "nameIndex": MaltNameIndex,
+        "leakTable": MaltLeakTable,
+        "rollup": MaltRollup,
+        "callGraph": MaltCallGraph,
+    }
+    # Memory budget for the flattened stacks
+    flatStackBytes = 64 << 20
+
+    # Choices of topN
+    topMetrics = ("count", "sum", "globalPeak")
+    topGroups = ("function", "file", "line", "stack")
+    # Choices of shortLived and the largest mean size it ranks
+    shortLivedKeys = ("count", "meanLifetime", "churn")
+    shortLivedSize = 1024
+
+    # Only set for merged profiles
+    ranks = None
+    rankStats = None
+
+    def __init__(
+        self, fname, filterBy=None, stream=False, cache=True, rules=None, distinct=False
+    ):
         """
         Geneerate an instance of class MaltReaderJSON from file fname.
         If filterBy is provided, only entries that have that string
         in the file name will be included in the data calculations.
+        Entries matching the filter rules are culled as well.
         All allocations that are made by culled entities are ascribed
-        to their parents.
+        to their parents.  If stream is True the file is parsed
+        incrementally so that the raw JSON tree is never built.
+        If cache is True, a valid sidecar cache is used instead of
+        the JSON file and is written after the file has been indexed.
+        If distinct is True, inclusive values are credited once per
+        function and line of a stack.
         """
 
-        # Read the data
+        # Set up the filter rules
+        self.filter = MaltFilter(rules)
+        self.distinct = distinct
+        self.flatStacks = MaltLRUCache(self.flatStackBytes)
+        self.aggregates = {}
+        if filterBy is not None:
+            self.filter.add([f"+file:{re.escape(filterBy)}"])
+
+        # Use the cache if we can
+        self.cache = MaltCache(fname, self.settings()) if cache else None
+        if self.cache is not None and self.cache.load():
+            self.data = MaltCacheData(self.cache)
+            return
+
+        # Read the data, interning the stacks as they go by
         print(f"Reading {fname}")
         data = None
-        reDemangle = re.compile("\([^\)]*\)")
-        with open(fname, "r") as fp:
-            data = json.load(fp)
+        self.instrTable = table = MaltInstrTable()
+        self.stacks = stacks = MaltStackTable(table)
+        if stream:
+            data = readMaltStream(fname, stacks.append)
+        else:
+            with open(fname, "r") as fp:
+                data = json.load(fp)
+            for item in data["stacks"].pop("stats"):
+                stacks.append(item)
+        stacks.finish()
+        self.build_(data)
+
+        # Save everything for the next time around
+        if self.cache is not None:
+            self.cache.save(self.cacheSections_())
+
+    @classmethod
+    def fromCache(cls, cache, filter=None):
+        """
+        Returns a reader whose members are all loaded lazily from
+        cache, e.g. a cache attached to shared memory.
+        """
+        self = cls.__new__(cls)
+        self.filter = filter
+        self.flatStacks = MaltLRUCache(self.flatStackBytes)
+        self.aggregates = {}
+        self.cache = cache
+        self.data = MaltCacheData(cache)
+        return self
+
+    @classmethod
+    def fromTables(cls, data, instrTable, stacks, filter=None, distinct=False):
+        """
+        Returns a reader built from the raw data dictionary and
+        address and stack tables that were already filtered, e.g. a
+        merged profile (see maltReaderMerge.py).  Nothing is cached.
+        """
+        self = cls.__new__(cls)
+        self.filter = filter
+        self.distinct = distinct
+        self.flatStacks = MaltLRUCache(self.flatStackBytes)
+        self.aggregates = {}
+        self.cache = None
+        self.instrTable = instrTable
+        self.stacks = stacks
+        self.build_(data, filter=False)
+        return self
+
+    def build_(self, data, filter=True):
+        """
+        Filters (unless filter is False) and indexes the stacks read
+        from data
+        """
         self.data = data
         self.leaks = data["leaks"]
         self.names = self.data["sites"]["strings"]
         self.instr = instr = self.data["sites"]["instr"]
-        self.count = {}
+        self.instrTable.resolve(instr, self.names)
+        self.timeline = MaltTimeline.fromMalt(
+            self,
+            data["timeline"].pop("memoryTimeline"),
+            data["globals"]["ticksPerSecond"],
+        )
 
-        # Filter out uninteresting stuff
-        self.filterDataByString_(filterBy)
+        # Filter out allocs, callocs, ... and other uninteresting stuff
+        if filter:
+            self.filter_()
 
         # Generate instr to name map
-        self.callsite = {}
         self.instrMap = instrMap = {}
         self.nameMap = nameMap = {}
         self.fileAlloc = {}
@@ -125,53 +379,59 @@ class MaltReaderJSON:
                 nameMap[myFunction] = []
             nameMap[myFunction].append(item)
 
-        # Filter out allocs, callocs, ...
-        self.filterAllocs_()
-
-        # create indices for quick lookups
-        # An experimental feature that isn't quite working yet
+        # Index the stacks by function and by file and line
         self.index_()
 
+        # The leaks interned by stack
+        self.leakTable = MaltLeakTable.fromMalt(self.leaks, self.instrTable)
+        self.rollup_()
+
         # Update leak information in file allocations
         self.updateLeakInfo()
 
+    def __getattr__(self, name):
+        """
+        Loads members from the cache, or builds the call tree, the
+        first time they are used
+        """
+        if name == "callTree":
+            self.callTree = MaltCallTree.fromStacks(self.stacks, self.leakTable)
+            return self.callTree
+        cache = self.__dict__.get("cache")
+        if cache is None:
+            raise AttributeError(name)
+        if name in self.cachedTables:
+            value = self.cachedTables[name].fromSections(
+                lambda field: cache.section(f"{name}.{field}"), self
+            )
+        elif name in self.cachedMembers and name in cache:
+            value = cache.section(name)
+        else:
+            raise AttributeError(name)
+        setattr(self, name, value)
+        return value
+
+    def settings(self):
+        """Returns the settings that the indexed profile depends on"""
+        return {"rules": self.filter.settings(), "distinct": self.distinct}
+
+    def cacheSections_(self):
+        """Returns the sections that are stored in the cache"""
+        sections = {name: getattr(self, name) for name in self.cachedMembers}
+        for name in self.cachedTables:
+            for field, value in getattr(self, name).toSections().items():
+                sections[f"{name}.{field}"] = value
+        sections["globals"] = self.data["globals"]
+        return sections
+
     def addToKey(self, theDict, key, value=0):
         if key not in theDict:
             theDict[key] = value
         else:
             theDict[key] += value
 
-    def updateLeakInfo(self):
-        """Update leak info for leaks"""
-        for l in self.leaks:
-            memory = float(l["memory"])
-            theStack = l["stack"]
-            for stackEntry in theStack:
-                iMap = self.instrMap[stackEntry]
-                name = iMap[0]
-                fname = iMap[1]
-                lineNum = iMap[2]
-                if fname not in self.fileAlloc:
-                    self.fileAlloc[fname] = {
-                        "incl": {},
-                        "excl": {},
-                        "gIncl": {},
-                        "gExcl": {},
-                        "leaks": {},
-                    }
-                falloc = self.fileAlloc[fname]
-                self.addToKey(falloc["leaks"], lineNum, memory)
-
-    def addToIndex_(self, stackEntry, count, inclusive, exclusive=0, globalPeak=0):
-        """Enables indexed searching for higher speed"""
-        iMap = self.instrMap[stackEntry]
-        name = iMap[0]
-        fname = iMap[1]
-        lineNum = iMap[2]
-        self.addToKey(self.count, name, count)
-        self.addToKey(self.inclusive, name, inclusive)
-        self.addToKey(self.exclusive, name, exclusive)
-
+    def fileAllocFor_(self, fname):
+        """Returns the per-line allocation dictionaries of file fname"""
         if fname not in self.fileAlloc:
             self.fileAlloc[fname] = {
                 "incl": {},
@@ -180,21 +440,20 @@ class MaltReaderJSON:
                 "gExcl": {},
                 "leaks": {},
             }
-        falloc = self.fileAlloc[fname]
-
-        self.addToKey(falloc["incl"], lineNum, inclusive)
-        self.addToKey(falloc["excl"], lineNum, exclusive)
-
-        if globalPeak > 0:
-            if name not in self.globalPeak:
-                self.globalPeak[name] = [0, 0]
-            # always add to inclusive
-            self.globalPeak[name][0] += globalPeak
-            self.addToKey(falloc["gIncl"], lineNum, globalPeak)
-            if exclusive > 0:
-                # Add exclusive only if exclusive is non-zero
-                self.globalPeak[name][1] += globalPeak
-                self.addToKey(falloc["gExcl"], lineNum, globalPeak)
+        return self.fileAlloc[fname]
+
+    def updateLeakInfo(self):
+        """
+        Update leak info for leaks: every (file, line) of a leak stack
+        is credited with its memory
+        """
+        lines = self.leakTable.aggregate("line", False, self.distinct)
+        files = self.instrTable.files
+        for x, memory in zip(lines["key"].tolist(), lines["memory"].tolist()):
+            if x < 0:
+                continue
+            falloc = self.fileAllocFor_(files[x >> 32])
+            self.addToKey(falloc["leaks"], (x & 0xFFFFFFFF) - 1, float(memory))
 
     def index_(self):
         """
@@ -204,124 +463,364 @@ class MaltReaderJSON:
         of a subroutine as key and the appropriate memory as value,
         except for self.globalPeak which is a list with
         [inclusiveGlobalPeak, exclusiveGlobalPeak] as values
+
+        Every frame of every stack that carries memory is credited
+        with the count and sum of its stack (inclusive); the top frame
+        is also credited with the sum as exclusive memory.  The sums
+        are done over the flattened stack arrays with one grouped sum
+        per function and per (file, line).
         """
-        self.inclusive = {}
-        self.exclusive = {}
-        self.globalPeak = {}
-
-        stats = self.data["stacks"]["stats"]
-        for item in stats:
-            theStack = item["stack"]
-            infos = item["infos"]
-            count = infos["alloc"]["count"]
-            sumAlloc = infos["alloc"]["sum"]
-            globalPeak = infos["globalPeak"]
-            if (sumAlloc == 0 or len(theStack) == 0) and globalPeak == 0:
-                continue
-            inclusive = exclusive = sumAlloc
-            theStackId = item["stackId"]
-            self.callsite[theStackId] = theStack
-            for stackEntry in theStack:
-                self.addToIndex_(stackEntry, count, inclusive, exclusive, globalPeak)
-                # reset exclusive to 0 for lower items in stack
-                exclusive = 0
+        stacks = self.stacks
+        table = self.instrTable
+        lengths = stacks.lengths()
+        indexed = ((stacks.sum != 0) & (lengths > 0)) | (stacks.globalPeak != 0)
+        self.callsite = MaltCallsites(stacks, table, indexed)
+
+        # Flatten the indexed stacks into per-frame columns
+        rows, frames, top = self.frameColumns_(indexed)
+        count = stacks.count[rows]
+        inclusive = stacks.sum[rows]
+        exclusive = np.where(top, inclusive, 0)
+        globalPeak = stacks.globalPeak[rows]
+        peak = globalPeak > 0
+        peakExclusive = np.where(exclusive > 0, globalPeak, 0)
+
+        # Per function
+        funcNames = table.funcNames
+        funcs = table.funcId[frames]
+        if self.distinct:
+            # only the first frame of a function in a stack counts
+            once = firstPerRow(rows, funcs)
+            count = np.where(once, count, 0)
+            inclusive = np.where(once, inclusive, 0)
+            globalPeak = np.where(once, globalPeak, 0)
+        ids, (c, i, e) = groupSums(funcs, count, inclusive, exclusive)
+        names = [funcNames[x] for x in ids.tolist()]
+        self.count = dict(zip(names, c.tolist()))
+        self.inclusive = dict(zip(names, i.tolist()))
+        self.exclusive = dict(zip(names, e.tolist()))
+        self.nameIndex = MaltNameIndex(names, c, i, e)
+        ids, (gi, ge) = groupSums(funcs[peak], globalPeak[peak], peakExclusive[peak])
+        self.globalPeak = {
+            funcNames[x]: [a, b]
+            for x, a, b in zip(ids.tolist(), gi.tolist(), ge.tolist())
+        }
+        self.callGraph = MaltCallGraph.fromFrames(rows, funcs, stacks, funcNames)
+
+        # Per (file, line)
+        files = table.files
+        lines = table.fileId[frames].astype(np.int64) << 32 | table.line[frames] + 1
+        if self.distinct:
+            once = firstPerRow(rows, lines)
+            inclusive = np.where(once, stacks.sum[rows], 0)
+            globalPeak = np.where(once, stacks.globalPeak[rows], 0)
+        self.fileAlloc = {}
+        peakExcl = peakExclusive > 0
+        for key, sums in (
+            ("incl", groupSums(lines, inclusive)),
+            ("excl", groupSums(lines, exclusive)),
+            ("gIncl", groupSums(lines[peak], globalPeak[peak])),
+            ("gExcl", groupSums(lines[peakExcl], peakExclusive[peakExcl])),
+        ):
+            ids, (values,) = sums
+            for x, value in zip(ids.tolist(), values.tolist()):
+                falloc = self.fileAllocFor_(files[x >> 32])
+                falloc[key][(x & 0xFFFFFFFF) - 1] = value
         print("indexing done")
 
-    def filterDataByString_(self, filterBy):
+    def rollup_(self):
         """
-        Removes all entries that dont contain the filterBy string
-        in the file from which they emanate
+        Rolls the memory of the stacks and leaks up by file, directory,
+        project root and library (see maltReaderRollup.py)
         """
+        stacks = self.stacks
+        rows, frames, top = self.frameColumns_(self.callsite.indexed)
+        inclusive = stacks.sum[rows]
+        globalPeak = stacks.globalPeak[rows]
+        leaks = self.leakTable
+        leakRows = np.repeat(np.arange(len(leaks)), leaks.lengths())
+        exclusive = top & (inclusive > 0)
+        self.rollup = MaltRollup.fromFrames(
+            self.instrTable,
+            {
+                "incl": (rows, frames, inclusive),
+                "excl": (rows[top], frames[top], inclusive[top]),
+                "gIncl": (rows, frames, globalPeak),
+                "gExcl": (rows[exclusive], frames[exclusive], globalPeak[exclusive]),
+                "leaks": (leakRows, leaks.frames, leaks.stackMemory[leakRows]),
+            },
+        )
 
-        if filterBy is None:
-            return
-
-        names = self.names
-        instr = self.instr
-        removers = {}
-        for item, iDict in instr.items():
-            idFile = iDict["file"]
-            myFile = names[idFile]
-            if not myFile.find(filterBy) >= 0:
-                removers[item] = 0
-
-        # Now remove them from the stacks
-        stats = self.data["stacks"]["stats"]
-        for s in stats:
-            myStack = s["stack"]
-            newStack = {x: None for x in myStack}
-            for item in myStack:
-                if item in removers and item in newStack:
-                    newStack.pop(item)
-            s["stack"] = list(newStack)
-        print(f"filtering by {filterBy} done.")
-
-    def filterAllocs_(self):
-        """
-        Removes following entries:
-           realloc, calloc, malloc, "operator new(unsigned long)",
-           anything starting with "__gnu_cxx::"
+    def filter_(self):
+        """
+        Removes the frames flagged by the filter rules from all the
+        stacks and leaks.  The rules are compiled once into a mask
+        over the instr table which is then applied to every stack in
+        one pass; timeline callsites refer to these same stacks.
+        Repeats of an address within a stack are dropped as well, and
+        stacks that end up identical are merged into one.
         This will assign allocated memory to caller
         """
-        names = self.names
-        instr = self.instr
-        removers = {}
-        for entry in self.nameMap:
-            if (
-                entry
-                in [
-                    "calloc",
-                    "malloc",
-                    "posix_memalign",
-                    "realloc",
-                    "operator new(unsigned long)",
-                ]
-                or entry.startswith("__gnu_cxx::")
-                or entry.find("/libstdc++/") > 0
-            ):
-                for item in self.nameMap[entry]:
-                    removers[item] = 0
-
-        # Now remove them from the stacks
-        stats = self.data["stacks"]["stats"]
-        for s in stats:
-            myStack = s["stack"]
-            newStack = {x: None for x in myStack}
-            for item in myStack:
-                if item in removers and item in newStack:
-                    newStack.pop(item)
-            s["stack"] = list(newStack)
-        print(f"filtering Allocators done.")
+        table = self.instrTable
+        removers = self.filter.mask(table)
+
+        # Now remove them from the stacks and merge the stacks that
+        # became identical
+        self.stacks.removeFrames(removers)
+        nMerged = self.stacks.merge()
+        print(f"merged {nMerged} stacks that were identical after filtering.")
+
+        # ... and remove them from the leaks
+        removed = {table.addrs[x] for x in np.flatnonzero(removers).tolist()}
+        for l in self.leaks:
+            l["stack"] = [x for x in dict.fromkeys(l["stack"]) if x not in removed]
+        print(f"filtering done ({len(self.filter.rules)} rules).")
+
+    def frameColumns_(self, indexed):
+        """
+        Returns the row, address id and top of stack flag of every frame
+        of the stacks flagged in indexed
+        """
+        stacks = self.stacks
+        rows = stacks.rows()
+        top = np.zeros(len(rows), dtype=bool)
+        top[stacks.offsets[:-1][stacks.lengths() > 0]] = True
+        keep = indexed[rows]
+        return rows[keep], stacks.frames[keep], top[keep]
+
+    def groupKeys_(self, groupBy, exclusive=False):
+        """
+        Returns the stack row and group key of every frame that is
+        credited when grouping by groupBy, and a function giving the
+        name of a key.  With exclusive only the top frames count.
+        """
+        if groupBy not in self.topGroups:
+            raise ValueError(f"Unknown grouping {groupBy}, use one of {self.topGroups}")
+        stacks = self.stacks
+        indexed = self.callsite.indexed
+        if groupBy == "stack":
+            rows = np.flatnonzero(indexed)
+            return rows, rows, lambda x: stacks.stackIds[x]
+
+        rows, frames, top = self.frameColumns_(indexed)
+        if exclusive:
+            rows = rows[top]
+            frames = frames[top]
+        table = self.instrTable
+        files = table.files
+        if groupBy == "function":
+            keys = table.funcId[frames]
+            name = lambda x: table.funcNames[x]
+        elif groupBy == "file":
+            keys = table.fileId[frames]
+            name = lambda x: files[x]
+        else:
+            keys = table.fileId[frames].astype(np.int64) << 32 | table.line[frames] + 1
+            name = lambda x: f"{files[x >> 32]}:{(x & 0xFFFFFFFF) - 1}"
+        if self.distinct and not exclusive:
+            once = firstPerRow(rows, keys)
+            rows = rows[once]
+            keys = keys[once]
+        return rows, keys, name
+
+    def aggregate_(self, metric, exclusive, groupBy):
+        """
+        Returns the group ids, the totals of metric over the groups
+        and a function giving the name of a group id
+        """
+        stacks = self.stacks
+        if metric in self.topMetrics:
+            values = getattr(stacks, metric)
+        elif metric in stacks.infoFields:
+            values = stacks.info(metric)
+        else:
+            raise ValueError(f"Unknown metric {metric}, use one of {self.topMetrics}")
+        if exclusive and metric == "globalPeak":
+            # as in index_, only stacks that allocated count here
+            values = np.where(stacks.sum > 0, values, 0)
+        rows, keys, name = self.groupKeys_(groupBy, exclusive)
+        if groupBy == "stack":
+            return rows, values[rows], name
+        if metric in self.topMetrics or infoFold(metric) == "sum":
+            ids, (sums,) = groupSums(keys, values[rows])
+            return ids, sums, name
+        # minima and maxima of the infos fields
+        fields = [metric]
+        columns = [values[rows]]
+        count = metric.rsplit(".", 1)[0] + ".count"
+        if count in stacks.infoFields:
+            fields.append(count)
+            columns.append(stacks.info(count)[rows])
+        ids, groups = np.unique(keys, return_inverse=True)
+        folded = foldInfos(fields, np.stack(columns, axis=1), groups, len(ids))
+        return ids, folded[:, 0], name
+
+    def shortLived(self, groupBy="function", sortBy="count", maxSize=None, n=None):
+        """
+        Returns the call sites of small allocations ranked by sortBy as
+        a dictionary of arrays
+        """
+        if maxSize is None:
+            maxSize = self.shortLivedSize
+        if sortBy not in self.shortLivedKeys:
+            raise ValueError(f"Unknown key {sortBy}, use one of {self.shortLivedKeys}")
+        stacks = self.stacks
+        fields = ["alloc.count", "alloc.sum", "lifetime.count", "lifetime.sum"]
+        missing = [x for x in fields if x not in stacks.infoFields]
+        if missing:
+            raise ValueError(f"The profile has no {', '.join(missing)} statistics")
+        count, total, lives, lifetime = [stacks.info(x) for x in fields]
+        small = (count > 0) & (total <= maxSize * count)
+
+        # the allocations are ascribed to the top frame of their stack
+        rows, keys, name = self.groupKeys_(groupBy, exclusive=True)
+        keep = small[rows]
+        rows = rows[keep]
+        keys = keys[keep]
+        ids, (count, total, lives, lifetime) = groupSums(
+            keys, count[rows], total[rows], lives[rows], lifetime[rows]
+        )
+        ticks = float(self.data["globals"].get("ticksPerSecond", 1))
+        result = {
+            "count": count,
+            "meanSize": total / np.maximum(count, 1),
+            # sites that never freed anything come last
+            "meanLifetime": np.where(
+                lives > 0, lifetime / np.maximum(lives, 1) / ticks, np.inf
+            ),
+            "churn": total,
+        }
+        # the shortest lifetimes rank first
+        order = -result[sortBy] if sortBy == "meanLifetime" else result[sortBy]
+        best = topIndices(order, len(ids) if n is None else n)
+        result = {key: value[best] for key, value in result.items()}
+        result["name"] = [name(x) for x in ids[best].tolist()]
+        return result
+
+    def stackInfo(self, stackId):
+        """Returns the infos fields of stackId as a dictionary"""
+        stacks = self.stacks
+        row = stacks.rowOf[stackId]
+        return dict(zip(stacks.infoFields, stacks.infos[row].tolist()))
+
+    def topN(self, metric="sum", n=10, exclusive=False, groupBy="function"):
+        """
+        Returns the names and values of the n groups with the largest
+        metric, largest first
+        """
+        key = (metric, bool(exclusive), groupBy)
+        if key not in self.aggregates:
+            self.aggregates[key] = self.aggregate_(metric, exclusive, groupBy)
+        ids, values, name = self.aggregates[key]
+        best = topIndices(values, n)
+        return [name(x) for x in ids[best].tolist()], values[best]
+
+    def callersOf(self, name, metric="sum"):
+        """Returns the callers of function name with their metric"""
+        graph = self.callGraph
+        f = graph.funcId(name)
+        if f < 0:
+            return [], []
+        return self.edgeList_(*graph.callers(f), metric)
+
+    def calleesOf(self, name, metric="sum"):
+        """Returns the callees of function name with their metric"""
+        graph = self.callGraph
+        f = graph.funcId(name)
+        if f < 0:
+            return [], []
+        return self.edgeList_(*graph.callees(f), metric)
+
+    def edgeList_(self, funcs, weights, metric):
+        """Returns the names of funcs and their metric, largest first"""
+        if len(funcs) == 0:
+            return [], []
+        values = weights[:, MaltCallGraph.metrics.index(metric)]
+        order = np.argsort(-values, kind="stable")
+        funcNames = self.callGraph.funcNames
+        return [funcNames[x] for x in funcs[order].tolist()], values[order].tolist()
+
+    def pathNode_(self, path):
+        """Returns the call tree node of a list of addresses, or -1"""
+        addrId = self.instrTable.addrId
+        if any(x not in addrId for x in path):
+            return NO_NODE
+        return self.callTree.find([addrId[x] for x in path])
+
+    def underPath(self, path, metric="sum", exclusive=False):
+        """Returns the metric of the stacks through the call path"""
+        node = self.pathNode_(path)
+        if node == NO_NODE:
+            return 0
+        return self.callTree.value(node, metric, exclusive)
+
+    def childrenOf(self, path, metric="sum"):
+        """Returns the callees of the call path with their metric"""
+        node = self.pathNode_(path)
+        if node == NO_NODE:
+            return [], []
+        tree = self.callTree
+        nodes = tree.children(node)
+        values = tree.inclusive[nodes, tree.metrics.index(metric)]
+        order = np.argsort(-values, kind="stable")
+        addrs = self.instrTable.addrs
+        callees = [addrs[x] for x in tree.addr[nodes[order]].tolist()]
+        return callees, values[order].tolist()
 
     def allocsByName(self, name=None, exclusive=False, indices=False):
         """Given a name, prints all allocations associated by that name"""
         if name == None:
             name = "."
-        reFound = re.compile(name, re.IGNORECASE)
-        retVal = {}
-        base = self.exclusive if exclusive else self.inclusive
-        for entry in base:
-            m = reFound.search(entry)
-            if m is not None:
-                retVal[entry] = [base[entry], self.count[entry]]
-        return retVal
+        index = self.nameIndex
+        base = index.exclusive if exclusive else index.inclusive
+        rows = index.find(name).tolist()
+        return {
+            index.names[x]: [v, c]
+            for x, v, c in zip(rows, base[rows].tolist(), index.count[rows].tolist())
+        }
+
+    def searchByName(self, name=None, exclusive=False):
+        """
+        Returns the functions matching name with their allocations as
+        arrays, largest first
+        """
+        return self.nameIndex.search("." if name is None else name, exclusive)
 
     def flattenStack(self, stack):
-        location = ""
-        for s in stack:
-            if s in self.instrMap:
-                imap = self.instrMap[s]
-                func = imap[0]
-                line = imap[2]
-                location += f"< {line}:{func}"
-            else:
-                location += f"< ??:{s}"
+        return self.flatStacks.get(tuple(stack), self.flattenStack_)
+
+    def flattenStack_(self, stack):
+        instrMap = self.instrMap
+        location = "".join(
+            [
+                f"< {instrMap[s][2]}:{instrMap[s][0]}" if s in instrMap else f"< ??:{s}"
+                for s in stack
+            ]
+        )
         return location.strip()
 
     def flattenStackFromId(self, stackId):
-        if not stackId in self.callsite:
+        return self.flatStacks.get(stackId, self.flattenStackFromId_)
+
+    def flattenStackFromId_(self, stackId):
+        # unknown stacks and stacks filtered down to nothing alike
+        stack = self.callsite.get(stackId)
+        if not stack:
             return "UNKNOWN"
-        return self.flattenStack(self.callsite[stackId])
+        return self.flattenStack_(stack)
+
+    def annotatedStackFromId(self, stackId):
+        """Returns the stack of stackId as a list of instrMap entries"""
+        addrs = self.callsite.get(stackId)
+        if not addrs:
+            return [stackId]
+        stack = []
+        for s in addrs:
+            if s in self.instrMap:
+                stack.append(self.instrMap[s])
+            else:
+                stack.append(["??", "??", -1])
+        return stack
 
     def getAnnotatedTimeline(self):
         """
@@ -329,127 +828,124 @@ class MaltReaderJSON:
         in seconds and a flattened stack added to the data.
         """
         timeline = {}
-        timeScale = float(self.data["globals"]["ticksPerSecond"])
-        memTimeline = self.data["timeline"]["memoryTimeline"]
-        delta = float(memTimeline["perPoints"]) / timeScale
-        fields = memTimeline["fields"]
-        values = memTimeline["values"]
-        callsite = memTimeline["callsite"]
-        timeline["fields"] = ["t"] + fields + ["stack"]
-        # timeline["values"] = [[0.0, 0.0, 0.0, []]] + [[]] * len(values)
-        timeline["values"] = [[]] * len(values)
-        for idx, v in enumerate(values):
-            theSite = callsite[idx]
-            if not theSite in self.callsite:
-                stack = [theSite]
-            else:
-                addrStack = self.callsite[theSite]
-                stack = []
-                for s in addrStack:
-                    if s in self.instrMap:
-                        stack.append(self.instrMap[s])
-                    else:
-                        stack.append(["??", "??", -1])
-            t = (idx + 1) * delta
-            timeline["values"][idx] = [t] + v + [stack]
+        memTimeline = self.timeline
+        timeline["fields"] = ["t"] + memTimeline.fields + ["stack"]
+        stacks = [memTimeline.siteStack(s) for s in range(len(memTimeline.siteIds))]
+        timeline["values"] = [
+            [t] + v + [stacks[s]]
+            for t, v, s in zip(
+                memTimeline.time.tolist(),
+                memTimeline.values.tolist(),
+                memTimeline.site.tolist(),
+            )
+        ]
         return timeline
 
     def dumpTimeline(self, fname):
         """Dumps timeline to CSV file with stacks and time in seconds"""
-        from pprint import pprint
-
-        if fname is None:
-            fp = sys.stdout
-        else:
-            fp = open(fname, "w")
-        timeScale = float(self.data["globals"]["ticksPerSecond"])
-        memTimeline = self.data["timeline"]["memoryTimeline"]
-        print(memTimeline.keys())
-        delta = float(memTimeline["perPoints"]) / timeScale
-        fields = memTimeline["fields"]
-        values = memTimeline["values"]
-        callsite = memTimeline["callsite"]
-        fp.write(f"""time(s),request,"{'","'.join(fields)}",location\n""")
-        lastValue = 0
-        for idx, v in enumerate(values):
-            theSite = callsite[idx]
-            location = self.flattenStackFromId(theSite)
-            t = (idx + 1) * delta
-            value = v[0] - lastValue
-            fp.write(
-                f"""{t},{value},{','.join([f"{x}" for x in v])},"{location.strip()}"\n"""
+        memTimeline = self.timeline
+        fields = memTimeline.fields
+        values = memTimeline.values
+        # every callsite is only flattened once
+        locations = [self.flattenStackFromId(x) for x in memTimeline.siteIds]
+        locations = np.array(locations + [""], dtype=object)
+        requests = np.diff(values[:, 0], prepend=0) if len(values) > 0 else values
+        header = f"""time(s),request,"{'","'.join(fields)}",location"""
+        fmt = "%r,%d," + ",".join(["%d"] * values.shape[1]) + ',"%s"\n'
+        with MaltCSVWriter(fname, header) as writer:
+            writer.write(
+                fmt,
+                memTimeline.time,
+                requests,
+                *values.T,
+                locations[memTimeline.site],
             )
-            lastValue = v[0]
-
-        if fname is not None:
-            fp.close()
 
     def globalPeaks(self):
         """Returns the information at global peak"""
         retDict = {}
-        stats = self.data["stacks"]["stats"]
-        for item in stats:
-            theStack = item["stack"]
-            theStackId = item["stackId"]
-            infos = item["infos"]
-            globalPeak = infos["globalPeak"]
-            if globalPeak == 0:
-                continue
-            stack = [self.instrMap[s] for s in theStack]
+        stacks = self.stacks
+        addrs = self.instrTable.addrs
+        peaks = stacks.globalPeak
+        for row in np.flatnonzero(peaks).tolist():
+            # addresses missing from the instr table resolve to "??"
+            stack = [
+                self.instrMap.get(addrs[s], ["??", "??", -1, addrs[s]])
+                for s in stacks.stack(row).tolist()
+            ]
             if len(stack) > 0:
-                retDict[theStackId] = {
+                retDict[stacks.stackIds[row]] = {
                     "top": stack[0][0],
-                    "memory": globalPeak,
+                    "memory": int(peaks[row]),
                     "stack": stack,
                 }
+                if self.rankStats is not None:
+                    stats = self.rankStats["globalPeak"]
+                    retDict[stacks.stackIds[row]].update(
+                        {key: stats[key][row].item() for key in stats}
+                    )
         return retDict
 
     def dumpGlobalPeak(self, fname):
         """Dumps Global Peak data to CSV file with stacks"""
-        from pprint import pprint
-
-        if fname is None:
-            fp = sys.stdout
+        stacks = self.stacks
+        stackIds = stacks.stackIds
+        rows = np.flatnonzero(stacks.globalPeak)
+        if self.rankStats is None:
+            header = "Memory(MB),location"
+            fmt = '%.3f,"%s"\n'
         else:
-            fp = open(fname, "w")
-        stats = self.data["stacks"]["stats"]
-        fp.write(f"""Memory(MB),location\n""")
-        for item in stats:
-            theStack = item["stack"]
-            infos = item["infos"]
-            globalPeak = infos["globalPeak"]
-            if globalPeak == 0:
-                continue
-            theStackId = item["stackId"]
-            location = self.flattenStackFromId(theStackId)
-            fp.write(f"""{float(globalPeak)/1048576.:.3f},"{location}"\n""")
-
-        if fname is not None:
-            fp.close()
+            stats = self.rankStats["globalPeak"]
+            header = "Memory(MB),min(MB),mean(MB),max(MB),maxRank,location"
+            fmt = '%.3f,%.3f,%.3f,%.3f,%d,"%s"\n'
+        with MaltCSVWriter(fname, header) as writer:
+            # the locations are only built a block at a time
+            for start in range(0, len(rows), writer.blockRows):
+                block = rows[start : start + writer.blockRows]
+                columns = [stacks.globalPeak[block] / 1048576.0]
+                if self.rankStats is not None:
+                    columns += [
+                        stats["min"][block] / 1048576.0,
+                        stats["mean"][block] / 1048576.0,
+                        stats["max"][block] / 1048576.0,
+                        stats["argmax"][block],
+                    ]
+                ids = [stackIds[x] for x in block.tolist()]
+                locations = [self.flattenStackFromId(x) for x in ids]
+                writer.write(fmt, *columns, locations)
 
     def dumpLeaks(self, fname):
         """Dumps Leaks to CSV file with stacks"""
-        from pprint import pprint
-
-        if fname is None:
-            fp = sys.stdout
-        else:
-            fp = open(fname, "w")
         leaks = self.data["leaks"]
-        fp.write(f"""Memory(MB),count,location\n""")
-        for item in leaks:
-            mem = item["memory"]
-            count = item["count"]
-            theStack = item["stack"]
-            location = self.flattenStack(theStack)
-            fp.write(f"""{float(mem)/1048576.:.3f},{count},"{location}"\n""")
+        with MaltCSVWriter(fname, "Memory(MB),count,location") as writer:
+            # the locations are only built a block at a time
+            for start in range(0, len(leaks), writer.blockRows):
+                block = leaks[start : start + writer.blockRows]
+                writer.write(
+                    '%.3f,%s,"%s"\n',
+                    [float(item["memory"]) / 1048576.0 for item in block],
+                    [item["count"] for item in block],
+                    [self.flattenStack(item["stack"]) for item in block],
+                )
 
-        if fname is not None:
-            fp.close()
+    def dumpAll(self, base, suffix=".csv"):
+        """
+        Dumps the timeline, global peak and leaks to base_timeline,
+        base_globalPeak and base_leaks (with suffix added) at the same
+        time
+        """
+        runConcurrently(
+            [
+                (self.dumpTimeline, (f"{base}_timeline{suffix}",)),
+                (self.dumpGlobalPeak, (f"{base}_globalPeak{suffix}",)),
+                (self.dumpLeaks, (f"{base}_leaks{suffix}",)),
+            ]
+        )
 
 
 if __name__ == "__main__":
     # A couple utility routines and a test program
+    import os
     import sys
 
     def getArgs():
@@ -481,12 +977,86 @@ if __name__ == "__main__":
             action="store_true",
             help="Print the top 10 global peak values",
         )
+        parser.add_argument(
+            "-l",
+            dest="shortLived",
+            action="store_true",
+            help="Print the top 10 call sites of small allocations (at most "
+            f"{MaltReaderJSON.shortLivedSize} bytes), grouped as with -b",
+        )
+        parser.add_argument(
+            "-k",
+            dest="sortBy",
+            action="store",
+            default="count",
+            choices=MaltReaderJSON.shortLivedKeys,
+            help="Rank the small allocations (-l) by count (default), meanLifetime or churn",
+        )
+        parser.add_argument(
+            "-b",
+            dest="groupBy",
+            action="store",
+            default="function",
+            choices=MaltReaderJSON.topGroups,
+            help="Group the global peak values (-g) or short-lived allocations (-l) by function, file, line or stack",
+        )
+        parser.add_argument(
+            "-d",
+            dest="rollup",
+            action="store",
+            choices=MaltRollup.levels,
+            help="Print the top 10 files, directories, project roots or libraries by inclusive (exclusive with -e) memory",
+        )
         parser.add_argument(
             "-f",
             dest="filter",
             action="store",
             help="Filter entries by only including those whose files have this string in the name",
         )
+        parser.add_argument(
+            "-r",
+            dest="rules",
+            action="append",
+            help="Add a filter rule '[+|!]field:regex' with field one of function, file or library, or a preset such as @jemalloc, @tcmalloc or @kokkos.  May be repeated",
+        )
+        parser.add_argument(
+            "-s",
+            dest="stream",
+            action="store_true",
+            help="Parse the JSON files incrementally to reduce memory use",
+        )
+        parser.add_argument(
+            "-x",
+            dest="cache",
+            action="store_false",
+            help="Do not read or write the cache file kept next to each JSON file",
+        )
+        parser.add_argument(
+            "-j",
+            dest="workers",
+            action="store",
+            type=int,
+            help="Number of processes used to load the files (default: one per file, at most one per CPU)",
+        )
+        parser.add_argument(
+            "-m",
+            dest="merge",
+            action="store_true",
+            help="Merge the files, e.g. one per MPI rank, into a single profile",
+        )
+        parser.add_argument(
+            "-u",
+            dest="distinct",
+            action="store_true",
+            help="Credit each function and source line once per stack, so that recursion is not counted several times",
+        )
+        parser.add_argument(
+            "-z",
+            dest="compress",
+            action="store",
+            choices=["gz", "zst"],
+            help="Compress the CSV files with gzip or zstd",
+        )
         parser.add_argument("files", help="remainder of command line", nargs="*")
 
         # parse the command line
@@ -500,18 +1070,6 @@ if __name__ == "__main__":
 
         return args
 
-    def sortByValueN(theValues, index=0):
-        """Returns a list in acending sort for the results"""
-        newDict = {
-            f"{value[index]:16.0f}_{key}": value[index]
-            for key, value in theValues.items()
-        }
-        retList = []
-        for key in sorted(newDict.keys()):
-            value = newDict[key]
-            retList.append((key[17:], value))
-        return retList
-
     def formatNumber(v, suffix=""):
         """
         Utility to format a number appropriately scaled
@@ -550,19 +1108,74 @@ if __name__ == "__main__":
     # -------------------------------
     args = getArgs()
     name = args.name
-    for fname in args.files:
+    from maltReaderPool import loadReaders
+    from maltReaderMerge import mergeProfiles
+
+    fnames = args.files
+    if args.merge:
+        readers = [
+            mergeProfiles(
+                fnames,
+                args.filter,
+                args.stream,
+                args.cache,
+                args.rules,
+                args.workers,
+                args.distinct,
+            )
+        ]
+        # dumps of the merged profile go next to the first rank file
+        fnames = [f"{os.path.splitext(fnames[0])[0]}_merged.json"]
+    else:
+        readers = loadReaders(
+            fnames,
+            args.filter,
+            args.stream,
+            args.cache,
+            args.rules,
+            args.workers,
+            args.distinct,
+        )
+    for fname, mt in zip(fnames, readers):
         exclusive = args.exclusive
-        filterBy = args.filter
-        mt = MaltReaderJSON(fname, filterBy)
         topN = 10
 
-        if args.globalPeaks:
+        if args.shortLived:
+            """Printing the call sites of small, short-lived allocations"""
+            sites = mt.shortLived(args.groupBy, args.sortBy, n=topN)
+            print(f"Allocations of at most {mt.shortLivedSize} bytes")
+            print("       count  mean size  mean life      churn")
+            for key, c, size, life, churn in reversed(
+                list(
+                    zip(
+                        sites["name"],
+                        sites["count"].tolist(),
+                        sites["meanSize"].tolist(),
+                        sites["meanLifetime"].tolist(),
+                        sites["churn"].tolist(),
+                    )
+                )
+            ):
+                if args.groupBy == "stack":
+                    key = mt.flattenStackFromId(key)
+                print(
+                    f"    {formatNumber10(c)} {formatNumber(size,'B')} {life:9.3g}s {formatNumber(churn,'B')} {key[:20] + '...' + key[-57:] if len(key) > 77 else key  }"
+                )
+        elif args.rollup:
+            """Printing the memory of files, directories, ... and libraries"""
+            metric = "excl" if exclusive else "incl"
+            keys, values = mt.rollup.top(args.rollup, metric, topN)
+            for key, v in reversed(list(zip(keys, values.tolist()))):
+                if v == 0:
+                    continue
+                print(
+                    f"    {formatNumber(v,'B')} {key[:20] + '...' + key[-57:] if len(key) > 77 else key  }"
+                )
+        elif args.globalPeaks:
             """Printing values at global peak memory usage"""
-            retList = sortByValueN(mt.globalPeak, args.exclusive)
-            # Print top N entries
-            for entry in retList[-topN:]:
-                key = entry[0]
-                v = entry[1]
+            keys, values = mt.topN("globalPeak", topN, exclusive, args.groupBy)
+            # Print top N entries, largest last
+            for key, v in reversed(list(zip(keys, values.tolist()))):
                 if v == 0:
                     continue
                 print(
@@ -570,24 +1183,18 @@ if __name__ == "__main__":
                 )
         else:
             """Printing memory allocations for entries that match regexp name"""
-            myAllocs = mt.allocsByName(name, exclusive, False)
-            retList = sortByValueN(myAllocs)
+            keys, values, counts = mt.searchByName(name, exclusive)
 
-            # Print top N entries
-            for entry in retList[-topN:]:
-                key = entry[0]
-                v = entry[1]
+            # Print top N entries, largest last
+            for key, v, c in reversed(
+                list(zip(keys[:topN], values[:topN].tolist(), counts[:topN].tolist()))
+            ):
                 if v == 0:
                     continue
-                c = mt.count[key]
                 print(
                     f"    {formatNumber(v,'B')} {formatNumber10(c)} {key[:20] + '...' + key[-57:] if len(key) > 77 else key  }"
                 )
 
         # Dump timeline, global peak information, and leaks to CSV files
-        import os
-
         base = os.path.splitext(fname)[0]
-        mt.dumpTimeline(f"{base}_timeline.csv")
-        mt.dumpGlobalPeak(f"{base}_globalPeak.csv")
-        mt.dumpLeaks(f"{base}_leaks.csv")
+        mt.dumpAll(base, ".csv" if args.compress is None else f".csv.{args.compress}")
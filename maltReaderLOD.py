@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+
+"""
+A level-of-detail pyramid for drawing long series on a few pixels.
+
+  MaltLOD(x, ys, first=2):
+        x: The sorted x values of all the points (e.g. time)
+       ys: A list of y arrays, one per series, the same length as x
+    first: The first level kept.  Level k splits the points into
+           buckets of 2**k and holds the index of the smallest and of
+           the largest y of every bucket for every series.  Levels
+           below first are not needed (see query).
+
+  Every level is built from the one below it, so the whole pyramid
+  costs a few passes over the points and about half an index per
+  point and series.  Drawing the minimum and maximum of every bucket
+  keeps every spike visible, unlike taking every n-th point.
+
+Methods:
+   range(x0, x1):
+     Returns the slice [lo, hi) of the points with x0 <= x <= x1
+     widened by one point on each side, so that lines run to the
+     edges of the view.  A binary search on x, O(log n).
+
+   query(x0, x1, maxPoints):
+     Returns for every series the sorted indices of at most about
+     maxPoints points that draw it between x0 and x1: all of them if
+     there are few enough, otherwise the minima and maxima of the
+     buckets of the finest level that fits, together with the first
+     and last point of the range.
+"""
+
+import numpy as np
+
+
+class MaltLOD:
+    def __init__(self, x, ys, first=2):
+        self.x = x
+        self.ys = ys
+        self.first = first
+        # levels[k - first][s] is an (nBuckets, 2) array of indices
+        self.levels = []
+        n = len(x)
+        size = 1 << first
+        if n <= size:
+            return
+        # the first level straight from the points
+        nBuckets = -(-n // size)
+        pad = np.minimum(np.arange(nBuckets * size), n - 1).reshape(nBuckets, size)
+        level = []
+        for y in ys:
+            values = y[pad]
+            base = pad[:, 0]
+            level.append(
+                np.stack(
+                    [base + values.argmin(axis=1), base + values.argmax(axis=1)],
+                    axis=1,
+                ).astype(np.int32)
+            )
+        self.levels.append(level)
+        # then every level from the one below
+        while len(level[0]) > 1:
+            upper = []
+            for y, below in zip(ys, level):
+                if len(below) % 2:
+                    below = np.concatenate([below, below[-1:]])
+                a, b = below[0::2], below[1::2]
+                lo = np.where(y[b[:, 0]] < y[a[:, 0]], b[:, 0], a[:, 0])
+                hi = np.where(y[b[:, 1]] > y[a[:, 1]], b[:, 1], a[:, 1])
+                upper.append(np.stack([lo, hi], axis=1))
+            self.levels.append(upper)
+            level = upper
+
+    def range(self, x0, x1):
+        """Returns the slice of the points between x0 and x1"""
+        x = self.x
+        lo = max(int(np.searchsorted(x, x0, "left")) - 1, 0)
+        hi = min(int(np.searchsorted(x, x1, "right")) + 1, len(x))
+        return lo, hi
+
+    def query(self, x0, x1, maxPoints):
+        """Returns the indices of the points of every series to draw"""
+        lo, hi = self.range(x0, x1)
+        n = hi - lo
+        # every bucket gives two points
+        k = max(int(np.ceil(np.log2(max(2 * n / max(maxPoints, 2), 1)))), 0)
+        if k < self.first or not self.levels:
+            return [np.arange(lo, hi)] * len(self.ys)
+        k = min(k, self.first + len(self.levels) - 1)
+        indices = []
+        for buckets in self.levels[k - self.first]:
+            picked = np.sort(buckets[lo >> k : ((hi - 1) >> k) + 1], axis=1).ravel()
+            # the ends of the range, minima and maxima inside it
+            picked = picked[(picked > lo) & (picked < hi - 1)]
+            indices.append(np.concatenate([[lo], picked, [hi - 1]]))
+        return indices
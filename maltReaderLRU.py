@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+"""
+A least recently used cache bounded by the memory of its values.
+
+  MaltLRUCache(maxBytes=64MB):
+    maxBytes: Budget for the values (as measured by sys.getsizeof).
+              The least recently used entries are evicted once the
+              budget is exceeded.
+
+Data Members:
+      nbytes: Current size of the values
+        hits: Number of lookups that found their key
+      misses: Number of lookups that did not
+
+Methods:
+   get(key, make):
+     Returns the value of key, calling make(key) to create (and cache)
+     it if it is not in the cache.
+
+   clear():
+     Empties the cache.
+
+  The cache may be shared by threads (see dumpAll of maltReaderJSON.py).
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+
+class MaltLRUCache:
+    def __init__(self, maxBytes=64 << 20):
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, make):
+        """Returns the cached value of key, making it if needed"""
+        entries = self.entries
+        with self.lock:
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = make(key)
+        size = sys.getsizeof(value)
+        if size > self.maxBytes:
+            return value
+        with self.lock:
+            if key not in entries:
+                entries[key] = value
+                self.nbytes += size
+            while self.nbytes > self.maxBytes:
+                _, old = entries.popitem(last=False)
+                self.nbytes -= sys.getsizeof(old)
+        return value
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
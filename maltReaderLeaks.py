@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+
+"""
+The leaks of a MALT profile, interned and aggregated.
+
+  MaltLeakTable(instrTable, offsets, frames, stack, memory, count):
+    instrTable: The MaltInstrTable resolving the address ids
+       offsets: distinct leak stack i is frames[offsets[i]:offsets[i+1]]
+        frames: address ids of the distinct leak stacks, innermost
+                frame first
+         stack: The distinct stack of every MALT leak record
+        memory: Leaked memory of every record
+         count: Number of leaked blocks of every record
+
+  MaltLeakTable.fromMalt(leaks, instrTable):
+    Builds the table from the MALT leak list in one pass, giving the
+    same id to every record with the same stack.  Addresses that are
+    not in instrTable are dropped.
+
+Data Members:
+   stackMemory: Leaked memory of every distinct stack
+    stackCount: Number of leaked blocks of every distinct stack
+
+Methods:
+   aggregate(groupBy="top", exclusive=True, distinct=False):
+     Returns the leaks grouped by groupBy, one of top (the top frame),
+     function, line (file:line) or stack (the full stack), as a
+     dictionary of arrays, largest memory first:
+          key: The group ids
+         name: The name of every group (a list)
+       memory: Leaked memory of every group
+        count: Number of leaked blocks of every group
+        stack: The distinct stack leaking most in every group
+     With exclusive only the top frame of a stack is credited,
+     otherwise every frame is (once per function or line of a stack
+     if distinct is True).  Stacks without frames go to the group
+     "no stack" (key -1).  Groupings are computed once and kept, so
+     switching between them is immediate.
+
+   stackAddrs(s):
+     Returns the address strings of distinct stack s.
+"""
+
+import numpy as np
+
+from maltReaderTables import firstPerRow, groupSums
+
+
+class MaltLeakTable:
+    sectionNames = ["offsets", "frames", "stack", "memory", "count"]
+    groupings = ("top", "function", "line", "stack")
+
+    def __init__(self, instrTable, offsets, frames, stack, memory, count):
+        self.instrTable = instrTable
+        self.offsets = offsets
+        self.frames = frames
+        self.stack = stack
+        self.memory = memory
+        self.count = count
+        self.stackMemory = np.zeros(len(offsets) - 1, dtype=np.int64)
+        np.add.at(self.stackMemory, stack, memory)
+        self.stackCount = np.zeros(len(offsets) - 1, dtype=np.int64)
+        np.add.at(self.stackCount, stack, count)
+        self.groups = {}
+
+    @classmethod
+    def fromMalt(cls, leaks, instrTable):
+        """Builds the table from the MALT leak list"""
+        # intern the address strings first, each distinct stack is only
+        # resolved to address ids once
+        stackId = {}
+        stack = np.array(
+            [stackId.setdefault(tuple(x["stack"]), len(stackId)) for x in leaks],
+            dtype=np.int32,
+        )
+        memory = np.array([x["memory"] for x in leaks], dtype=np.int64)
+        count = np.array([x["count"] for x in leaks], dtype=np.int64)
+        addrId = instrTable.addrId
+        stacks = [[addrId[a] for a in s if a in addrId] for s in stackId]
+        offsets = np.zeros(len(stacks) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in stacks], out=offsets[1:])
+        frames = np.array([x for s in stacks for x in s], dtype=np.int32)
+        return cls(instrTable, offsets, frames, stack, memory, count)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def lengths(self):
+        """Returns the number of frames of every distinct stack"""
+        return np.diff(self.offsets)
+
+    def stackAddrs(self, s):
+        """Returns the address strings of distinct stack s"""
+        addrs = self.instrTable.addrs
+        frames = self.frames[self.offsets[s] : self.offsets[s + 1]]
+        return [addrs[x] for x in frames.tolist()]
+
+    def keys_(self, groupBy, exclusive, distinct):
+        """
+        Returns the distinct stack and group key of every credited
+        frame, and a function giving the name of a key
+        """
+        table = self.instrTable
+        files = table.files
+        lengths = self.lengths()
+        if groupBy == "stack":
+            rows = np.arange(len(lengths))
+            return rows, rows, self.stackName_
+        if exclusive or groupBy == "top":
+            rows = np.flatnonzero(lengths > 0)
+            frames = self.frames[self.offsets[rows]]
+        else:
+            rows = np.repeat(np.arange(len(lengths)), lengths)
+            frames = self.frames
+        if groupBy == "top":
+            keys = frames.astype(np.int64)
+            name = lambda x: (
+                f"{table.funcNames[table.funcId[x]]} "
+                f"({files[table.fileId[x]]}:{table.line[x]})"
+            )
+        elif groupBy == "function":
+            keys = table.funcId[frames].astype(np.int64)
+            name = lambda x: table.funcNames[x]
+        else:
+            keys = table.fileId[frames].astype(np.int64) << 32 | table.line[frames] + 1
+            name = lambda x: f"{files[x >> 32]}:{(x & 0xFFFFFFFF) - 1}"
+        if distinct and not exclusive:
+            once = firstPerRow(rows, keys)
+            rows = rows[once]
+            keys = keys[once]
+        # the leaks without a stack have a group of their own
+        empty = np.flatnonzero(lengths == 0)
+        if len(empty) > 0:
+            rows = np.concatenate([rows, empty])
+            keys = np.concatenate([keys, np.full(len(empty), -1, dtype=np.int64)])
+        return rows, keys, lambda x: "no stack" if x < 0 else name(x)
+
+    def stackName_(self, s):
+        """Returns the name of the top frame of distinct stack s"""
+        if self.offsets[s] == self.offsets[s + 1]:
+            return "no stack"
+        table = self.instrTable
+        return table.funcNames[table.funcId[self.frames[self.offsets[s]]]]
+
+    def aggregate(self, groupBy="top", exclusive=True, distinct=False):
+        """Returns the leaks grouped by groupBy, largest first"""
+        if groupBy not in self.groupings:
+            raise ValueError(f"Unknown grouping {groupBy}, use one of {self.groupings}")
+        key = (groupBy, bool(exclusive), bool(distinct))
+        if key in self.groups:
+            return self.groups[key]
+        rows, keys, name = self.keys_(groupBy, exclusive, distinct)
+        memory = self.stackMemory[rows]
+        ids, (total, count) = groupSums(keys, memory, self.stackCount[rows])
+
+        # the stack leaking most in every group stands for the group
+        order = np.lexsort((-memory, keys))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = keys[order][1:] != keys[order][:-1]
+        stack = rows[order][first]
+        # stack follows the sorted keys, ids their first appearance
+        stack = stack[np.searchsorted(keys[order][first], ids)]
+
+        best = np.lexsort((np.arange(len(ids)), -total))
+        ids = ids[best]
+        result = self.groups[key] = {
+            "key": ids,
+            "name": [name(x) for x in ids.tolist()],
+            "memory": total[best],
+            "count": count[best],
+            "stack": stack[best],
+        }
+        return result
+
+    def toSections(self):
+        return {name: getattr(self, name) for name in self.sectionNames}
+
+    @classmethod
+    def fromSections(cls, get, reader):
+        return cls(reader.instrTable, *[get(name) for name in cls.sectionNames])
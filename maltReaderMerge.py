@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+"""
+Merges the MALT profiles of the ranks of an MPI run into one profile.
+
+  mergeProfiles(fnames, filterBy=None, stream=False, cache=True,
+                rules=None, workers=None, distinct=False):
+    Loads the files in fnames in parallel (see maltReaderPool.py) and
+    returns the merged profile, a MaltReaderJSON that can be used just
+    like the reader of a single file.  Rank i is fnames[i].
+
+  MaltRankMerger():
+    Folds the readers of the ranks, one at a time, into a merged
+    profile.  Only the merged tables are kept, so any number of ranks
+    can be merged.
+
+  Addresses differ from one rank to the next, so they are unified by
+  symbol: the function, file, line and binary of the address.
+  Addresses that are not in the instr table are only unified with the
+  same address string.  A merged address or stack keeps the address or
+  stack id of the first rank it was seen in, with "@rank" added if
+  that id is already taken.
+
+  The merged profile holds
+     count, sum, globalPeak: the totals over all ranks of every stack
+       infos: the infos fields of every stack combined over all ranks
+              (see foldInfos in maltReaderTables.py), with the fields
+              of the first rank
+       ranks: the list of file names, indexed by rank
+   rankStats: a dictionary with "sum" and "globalPeak" keys, each
+              holding a dictionary of per-stack arrays (indexed like
+              the stack table):
+                  min: smallest value on any rank (ranks that do not
+                       have the stack count as 0)
+                 mean: average over all ranks
+                  max: largest value on any rank
+               argmax: the rank with the largest value
+    timeline: the memory timelines of all ranks summed field by field
+              on the time base of the first rank (a field a rank does
+              not have counts as 0), with the callsite of each point
+              taken from the rank with the most requested memory at
+              that point
+       leaks: the leaks of all ranks, summed over identical stacks
+
+Methods:
+   add(reader, name):
+     Folds the MaltReaderJSON of the next rank into the merged
+     profile.  name (e.g. the file name) is kept in ranks.
+
+   finish():
+     Returns the merged profile.
+"""
+
+import numpy as np
+
+from maltReaderJSON import MaltReaderJSON
+from maltReaderPool import iterReaders
+from maltReaderTables import MaltInstrTable, MaltStackTable, foldInfos
+
+
+class MaltRankMerger:
+    metrics = ("count", "sum", "globalPeak")
+    rankMetrics = ("sum", "globalPeak")
+
+    def __init__(self):
+        self.ranks = []
+        self.globals = None
+        self.filter = None
+        self.distinct = False
+        # merged string table and instr dictionary
+        self.strings = []
+        self.stringId = {}
+        self.instr = {}
+        # merged addresses, by symbol
+        self.addrs = []
+        self.symbolId = {}
+        self.taken = set()
+        # merged stacks, by the bytes of their address ids
+        self.stackIds = []
+        self.stackRow = {}
+        self.takenStacks = set()
+        self.frames = []
+        self.totals = {name: np.zeros(0, dtype=np.int64) for name in self.metrics}
+        self.present = np.zeros(0, dtype=np.int64)
+        self.min = {name: np.zeros(0, dtype=np.int64) for name in self.rankMetrics}
+        self.max = {name: np.zeros(0, dtype=np.int64) for name in self.rankMetrics}
+        self.argmax = {
+            name: np.zeros(0, dtype=np.int64) for name in self.rankMetrics
+        }
+        self.infoFields = None
+        self.infos = None
+        # timeline on the time base of the first rank
+        self.delta = None
+        self.memTimeline = None
+        self.values = None
+        self.best = None
+        self.sites = None
+        self.leaks = {}
+
+    def string_(self, s):
+        idx = self.stringId.get(s)
+        if idx is None:
+            idx = self.stringId[s] = len(self.strings)
+            self.strings.append(s)
+        return idx
+
+    def unique_(self, name, rank, taken):
+        """Returns name, or name@rank if name is taken"""
+        if name in taken:
+            name = f"{name}@{rank}"
+        taken.add(name)
+        return name
+
+    def symbols_(self, table, rank):
+        """Returns the merged address id of every address of table"""
+        # map the name tables first so the symbols are tuples of ints
+        fulls = np.array([self.string_(x) for x in table.fullNames], dtype=np.int64)
+        files = np.array([self.string_(x) for x in table.files], dtype=np.int64)
+        binaries = np.array(
+            [self.string_(x) for x in table.binaries] + [-1], dtype=np.int64
+        )
+        keys = zip(
+            fulls[table.fullId].tolist(),
+            files[table.fileId].tolist(),
+            table.line.tolist(),
+            binaries[table.binaryId].tolist(),
+            table.known.tolist(),
+            table.addrs,
+        )
+        symbolId = self.symbolId
+        merged = np.empty(len(table.addrs), dtype=np.int32)
+        for idx, (full, fname, line, binary, known, addr) in enumerate(keys):
+            key = (full, fname, line, binary) if known else addr
+            sym = symbolId.get(key)
+            if sym is None:
+                sym = symbolId[key] = len(self.addrs)
+                addr = self.unique_(addr, rank, self.taken)
+                self.addrs.append(addr)
+                if known:
+                    iDict = {"function": full}
+                    if table.files[table.fileId[idx]] != "Unknown":
+                        iDict["file"] = fname
+                    if line != -1:
+                        iDict["line"] = line
+                    if binary != -1:
+                        iDict["binary"] = binary
+                    self.instr[addr] = iDict
+            merged[idx] = sym
+        return merged
+
+    def grow_(self, n):
+        """Makes room for n merged stacks in the per-stack arrays"""
+        extra = n - len(self.present)
+        if extra <= 0:
+            return
+        pad = np.zeros(extra, dtype=np.int64)
+        self.present = np.concatenate([self.present, pad])
+        for name in self.metrics:
+            self.totals[name] = np.concatenate([self.totals[name], pad])
+        for name in self.rankMetrics:
+            self.min[name] = np.concatenate([self.min[name], pad])
+            self.max[name] = np.concatenate([self.max[name], pad])
+            self.argmax[name] = np.concatenate([self.argmax[name], pad])
+        pad = np.zeros((extra, len(self.infoFields)), dtype=np.int64)
+        self.infos = np.concatenate([self.infos, pad])
+
+    def stacks_(self, stacks, symbols, rank):
+        """Folds the stacks of a rank in; returns the merged row of each"""
+        # every frame is kept, even if two addresses of a stack have
+        # the same symbol, so the totals are those of the ranks
+        frames = symbols[stacks.frames]
+        offsets = stacks.offsets
+
+        stackRow = self.stackRow
+        data = frames.tobytes()
+        bounds = (offsets * frames.itemsize).tolist()
+        merged = np.empty(len(stacks), dtype=np.int64)
+        for row, stackId in enumerate(stacks.stackIds):
+            key = data[bounds[row] : bounds[row + 1]]
+            mRow = stackRow.get(key)
+            if mRow is None:
+                mRow = stackRow[key] = len(self.stackIds)
+                self.stackIds.append(self.unique_(stackId, rank, self.takenStacks))
+                self.frames.append(key)
+            merged[row] = mRow
+        self.grow_(len(self.stackIds))
+
+        # stacks of a rank can merge, so sum them before the statistics
+        n = len(self.stackIds)
+        mRows = np.unique(merged)
+        for name in self.metrics:
+            value = np.zeros(n, dtype=np.int64)
+            np.add.at(value, merged, getattr(stacks, name))
+            self.totals[name] += value
+            if name not in self.rankMetrics:
+                continue
+            value = value[mRows]
+            first = self.present[mRows] == 0
+            lower = first | (value < self.min[name][mRows])
+            self.min[name][mRows[lower]] = value[lower]
+            higher = first | (value > self.max[name][mRows])
+            self.max[name][mRows[higher]] = value[higher]
+            self.argmax[name][mRows[higher]] = rank
+        self.present[mRows] += 1
+
+        # the infos fields of the rank, in the order of the first rank,
+        # folded into the merged rows the rank has
+        infos = np.zeros((len(stacks), len(self.infoFields)), dtype=np.int64)
+        for col, name in enumerate(self.infoFields):
+            if name in stacks.infoFields:
+                infos[:, col] = stacks.info(name)
+        self.infos[mRows] = foldInfos(
+            self.infoFields,
+            np.concatenate([self.infos[mRows], infos]),
+            np.concatenate([np.arange(len(mRows)), np.searchsorted(mRows, merged)]),
+            len(mRows),
+        )
+        return merged
+
+    def timeline_(self, reader, merged, rank):
+        """Adds the memory timeline of a rank to the merged timeline"""
+        timeline = reader.timeline
+        values = timeline.values
+        if len(values) == 0:
+            return
+        delta = timeline.delta
+        if self.delta is None:
+            self.delta = delta
+            self.memTimeline = dict(timeline.meta, fields=[])
+            self.values = np.zeros((0, 0), dtype=np.int64)
+            self.best = np.zeros(0, dtype=np.int64)
+            self.sites = np.zeros(0, dtype=np.int64)
+
+        # ranks are aligned by field name; new fields are 0 on the
+        # ranks before
+        fields = self.memTimeline["fields"]
+        extra = [x for x in timeline.fields if x not in fields]
+        if extra:
+            fields.extend(extra)
+            pad = np.zeros((len(self.values), len(extra)), dtype=np.int64)
+            self.values = np.concatenate([self.values, pad], axis=1)
+        cols = np.array([fields.index(x) for x in timeline.fields], dtype=np.int64)
+
+        # point i of the merged timeline is at time (i + 1) * delta; the
+        # rank contributes its latest value at that time, and nothing
+        # once it has finished
+        n = int(np.floor(len(values) * delta / self.delta + 1e-9))
+        if n > len(self.values):
+            extra = n - len(self.values)
+            self.values = np.concatenate(
+                [self.values, np.zeros((extra, self.values.shape[1]), np.int64)]
+            )
+            self.best = np.concatenate([self.best, np.full(extra, -1, np.int64)])
+            self.sites = np.concatenate([self.sites, np.full(extra, -1, np.int64)])
+        t = (np.arange(n) + 1) * self.delta
+        idx = np.floor(t / delta + 1e-9).astype(np.int64) - 1
+        points = np.flatnonzero(idx >= 0)
+        idx = idx[points]
+        self.values[points[:, None], cols] += values[idx]
+
+        rowOf = reader.stacks.rowOf
+        sites = np.array([rowOf.get(x, -1) for x in timeline.siteIds], dtype=np.int64)
+        sites = np.where(sites >= 0, merged[sites], -1)[timeline.site[idx]]
+        if "requestedMem" not in timeline.fields:
+            return
+        requested = timeline.column("requestedMem")[idx]
+        better = requested > self.best[points]
+        self.best[points[better]] = requested[better]
+        self.sites[points[better]] = sites[better]
+
+    def leaks_(self, reader, symbols):
+        """Adds the leaks of a rank to the merged leaks"""
+        addrId = reader.instrTable.addrId
+        addrs = self.addrs
+        for leak in reader.leaks:
+            # as in MaltLeakTable.fromMalt, unknown addresses are dropped
+            key = tuple(
+                addrs[symbols[addrId[x]]] for x in leak["stack"] if x in addrId
+            )
+            if key in self.leaks:
+                merged = self.leaks[key]
+                merged["memory"] += leak["memory"]
+                merged["count"] += leak["count"]
+            else:
+                self.leaks[key] = {
+                    "stack": list(key),
+                    "count": leak["count"],
+                    "memory": leak["memory"],
+                }
+
+    def add(self, reader, name):
+        """Folds the reader of the next rank into the merged profile"""
+        if self.globals is None:
+            self.globals = reader.data["globals"]
+            self.filter = reader.filter
+            self.distinct = reader.distinct
+            self.infoFields = list(reader.stacks.infoFields)
+            self.infos = np.zeros((0, len(self.infoFields)), dtype=np.int64)
+        rank = len(self.ranks)
+        self.ranks.append(name)
+        symbols = self.symbols_(reader.instrTable, rank)
+        merged = self.stacks_(reader.stacks, symbols, rank)
+        self.timeline_(reader, merged, rank)
+        self.leaks_(reader, symbols)
+
+    def finish(self):
+        """Returns the merged profile as a MaltReaderJSON"""
+        nRanks = len(self.ranks)
+        table = MaltInstrTable()
+        for addr in self.addrs:
+            table.intern(addr)
+        lengths = [len(x) // 4 for x in self.frames]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        frames = np.frombuffer(b"".join(self.frames), dtype=np.int32).copy()
+        stacks = MaltStackTable.fromArrays(
+            table,
+            self.stackIds,
+            offsets,
+            frames,
+            **self.totals,
+            infoFields=self.infoFields,
+            infos=self.infos,
+        )
+
+        if self.values is None:
+            memTimeline = {"fields": [], "perPoints": 1, "values": [], "callsite": []}
+            self.delta = 1.0
+        else:
+            memTimeline = dict(self.memTimeline)
+            memTimeline["values"] = self.values
+            stackIds = self.stackIds
+            memTimeline["callsite"] = [
+                stackIds[x] if x >= 0 else "UNKNOWN" for x in self.sites.tolist()
+            ]
+        # keep the timeline in the ticks of the merged time base
+        globals = dict(self.globals)
+        globals["ticksPerSecond"] = float(memTimeline.get("perPoints", 1)) / self.delta
+        data = {
+            "globals": globals,
+            "sites": {"strings": self.strings, "instr": self.instr},
+            "stacks": {},
+            "timeline": {"memoryTimeline": memTimeline},
+            "leaks": list(self.leaks.values()),
+        }
+        reader = MaltReaderJSON.fromTables(
+            data, table, stacks, self.filter, self.distinct
+        )
+
+        reader.ranks = self.ranks
+        reader.rankStats = {}
+        for name in self.rankMetrics:
+            low = np.where(self.present < nRanks, 0, self.min[name])
+            reader.rankStats[name] = {
+                "min": low,
+                "mean": self.totals[name] / max(nRanks, 1),
+                "max": self.max[name],
+                "argmax": self.argmax[name],
+            }
+        print(f"merged {nRanks} ranks into {len(self.stackIds)} stacks")
+        return reader
+
+
+def mergeProfiles(
+    fnames,
+    filterBy=None,
+    stream=False,
+    cache=True,
+    rules=None,
+    workers=None,
+    distinct=False,
+):
+    """Returns the merged profile of the rank files in fnames"""
+    merger = MaltRankMerger()
+    readers = iterReaders(fnames, filterBy, stream, cache, rules, workers, distinct)
+    for fname, reader in zip(fnames, readers):
+        merger.add(reader, fname)
+    return merger.finish()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+
+"""
+An index of the function names of a profile for regular expression
+searches.
+
+  MaltNameIndex(names, count, inclusive, exclusive):
+         names: List of function names
+         count: Number of allocations of every name (NumPy array)
+     inclusive: Inclusive allocated memory of every name
+     exclusive: Exclusive allocated memory of every name
+
+  The lowercase names (the haystack) are indexed by trigram: grams
+  holds the sorted distinct trigrams (three UTF-8 bytes packed in an
+  integer) and postings[offsets[i]:offsets[i+1]] the names holding
+  grams[i].  A search pulls the literal strings every match must
+  contain out of the regular expression, and only runs the expression
+  on the names holding all their trigrams.  Names with non-ASCII
+  characters are always searched, as case folding may map them onto
+  ASCII.
+
+Methods:
+   find(pattern):
+     Returns the sorted array of the indices of the names that match
+     pattern (searched case insensitively, as with re.search).
+
+   search(pattern, exclusive=False):
+     Returns the names that match pattern along with their memory and
+     count as three arrays, largest memory first.
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    from re import _parser as reParser, _constants as reConstants
+except ImportError:
+    import sre_parse as reParser, sre_constants as reConstants
+
+
+@lru_cache(maxsize=256)
+def requiredLiterals_(pattern):
+    """
+    Returns the literal strings that every match of pattern contains,
+    i.e. the runs of plain characters at the top level of pattern
+    """
+    literals = []
+    run = []
+    for op, value in reParser.parse(pattern):
+        if op is reConstants.LITERAL:
+            run.append(chr(value))
+            continue
+        if op is reConstants.BRANCH:
+            # a top level alternation, nothing is required
+            return ()
+        if run:
+            literals.append("".join(run))
+            run = []
+    if run:
+        literals.append("".join(run))
+    return tuple(literals)
+
+
+def trigrams_(data):
+    """Returns the trigram codes of the bytes in the uint32 array data"""
+    return data[:-2] << 16 | data[1:-1] << 8 | data[2:]
+
+
+def firsts_(values):
+    """Flags the first of every run of equal values in a sorted array"""
+    first = np.ones(len(values), dtype=bool)
+    first[1:] = values[1:] != values[:-1]
+    return first
+
+
+class MaltNameIndex:
+    sectionNames = [
+        "names",
+        "count",
+        "inclusive",
+        "exclusive",
+        "grams",
+        "offsets",
+        "postings",
+        "wide",
+    ]
+
+    def __init__(
+        self,
+        names,
+        count,
+        inclusive,
+        exclusive,
+        grams=None,
+        offsets=None,
+        postings=None,
+        wide=None,
+    ):
+        self.names = names
+        self.count = count
+        self.inclusive = inclusive
+        self.exclusive = exclusive
+        if grams is None:
+            grams, offsets, postings, wide = self.build_()
+        self.grams = grams
+        self.offsets = offsets
+        self.postings = postings
+        self.wide = wide
+
+    def build_(self):
+        """Returns the trigram index of the lowercase names"""
+        haystack = [name.lower() for name in self.names]
+        encoded = [name.encode() for name in haystack]
+        lengths = np.array([len(name) for name in encoded], dtype=np.int64)
+        wide = np.flatnonzero([not name.isascii() for name in haystack])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint32)
+
+        # the trigrams that do not straddle two names
+        owner = np.repeat(np.arange(len(lengths)), lengths)[:-2]
+        ends = np.cumsum(lengths)
+        if len(data) >= 3:
+            inside = np.arange(2, len(data)) < ends[owner]
+            codes = trigrams_(data)[inside].astype(np.int64)
+            owner = owner[inside]
+        else:
+            codes = owner = np.zeros(0, dtype=np.int64)
+
+        # one posting per distinct (trigram, name), grouped by trigram
+        pairs = np.sort(codes << 32 | owner)
+        pairs = pairs[firsts_(pairs)]
+        codes = pairs >> 32
+        starts = np.flatnonzero(firsts_(codes))
+        grams = codes[starts]
+        offsets = np.append(starts, len(codes)).astype(np.int64)
+        postings = (pairs & 0xFFFFFFFF).astype(np.int32)
+        return grams, offsets, postings, wide.astype(np.int32)
+
+    def posting_(self, code):
+        """Returns the names holding the trigram code"""
+        i = int(np.searchsorted(self.grams, code))
+        if i == len(self.grams) or self.grams[i] != code:
+            return self.postings[:0]
+        return self.postings[self.offsets[i] : self.offsets[i + 1]]
+
+    def candidates_(self, pattern):
+        """Returns the indices of the names that may match pattern"""
+        found = None
+        for literal in requiredLiterals_(pattern):
+            if not literal.isascii() or len(literal) < 3:
+                continue
+            data = np.frombuffer(literal.lower().encode(), dtype=np.uint8)
+            for code in np.unique(trigrams_(data.astype(np.uint32))).tolist():
+                posting = self.posting_(code)
+                if found is None:
+                    found = posting
+                else:
+                    found = np.intersect1d(found, posting, assume_unique=True)
+        if found is None:
+            return range(len(self.names))
+        return np.union1d(found, self.wide).tolist()
+
+    def find(self, pattern):
+        """Returns the indices of the names matching pattern"""
+        reFound = re.compile(pattern, re.IGNORECASE)
+        names = self.names
+        return np.array(
+            [x for x in self.candidates_(pattern) if reFound.search(names[x])],
+            dtype=np.int64,
+        )
+
+    def search(self, pattern, exclusive=False):
+        """Returns the names, memory and count of the matches of pattern"""
+        rows = self.find(pattern)
+        memory = (self.exclusive if exclusive else self.inclusive)[rows]
+        order = np.argsort(-memory, kind="stable")
+        rows = rows[order]
+        names = np.array([self.names[x] for x in rows.tolist()], dtype=object)
+        return names, memory[order], self.count[rows]
+
+    def __len__(self):
+        return len(self.names)
+
+    def toSections(self):
+        return {name: getattr(self, name) for name in self.sectionNames}
+
+    @classmethod
+    def fromSections(cls, get, reader):
+        return cls(*[get(name) for name in cls.sectionNames])
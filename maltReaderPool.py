@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+"""
+Loads several MALT profiles at once in a pool of processes.
+
+  loadReaders(fnames, filterBy=None, stream=False, cache=True,
+              rules=None, workers=None, distinct=False):
+       fnames: The list of JSON files to load
+      workers: Number of processes (defaults to one per file, at most
+               one per CPU).  With a single file or worker everything
+               is done in this process.
+    The other arguments are passed on to MaltReaderJSON.  Returns the
+    list of MaltReaderJSON instances in the order of fnames.  A file
+    that cannot be loaded raises a RuntimeError naming the file, which
+    the errors coming back from the workers do not.
+
+  iterReaders(fnames, ...):
+    Same as loadReaders, but yields the readers one at a time while the
+    pool works ahead on the next few files, so that only a handful of
+    profiles are in memory at once (see maltReaderMerge.py).
+
+  Each worker parses, filters and indexes one profile.  The result is
+  handed back in the layout of the sidecar cache (see
+  maltReaderCache.py): when the worker was able to write the cache
+  file, this process simply maps that file; otherwise the sections are
+  written to a block of shared memory which this process maps in place
+  of the file.  Either way only a name crosses the process boundary and
+  the arrays are used where they lie, without being pickled or copied.
+  Members are decoded lazily, just as for a cached profile.
+"""
+
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from maltReaderCache import MaltCache
+from maltReaderJSON import MaltReaderJSON
+
+
+def loadWorker_(fname, filterBy, stream, cache, rules, distinct):
+    """
+    Builds the reader for fname.  Returns None if it can be read back
+    from its cache file, otherwise the name of a shared memory block
+    holding its sections.
+    """
+    reader = MaltReaderJSON(fname, filterBy, stream, cache, rules, distinct)
+    if reader.cache is not None:
+        if reader.cache.mm is not None or reader.cache.load():
+            return None
+    shm = MaltCache(fname, reader.settings()).share(reader.cacheSections_())
+    name = shm.name
+    shm.close()
+    return name
+
+
+def loaded_(fname, load, *args):
+    """Returns load(*args), naming fname if it fails"""
+    try:
+        return load(*args)
+    except Exception as e:
+        raise RuntimeError(f"Unable to load file {fname}: {e}") from e
+
+
+def attach_(fname, name, filterBy, stream, cache, rules, distinct):
+    """Returns the reader for the result name of loadWorker_"""
+    if name is None:
+        return MaltReaderJSON(fname, filterBy, stream, cache, rules, distinct)
+    shared = MaltCache(fname)
+    shared.attach(name)
+    return MaltReaderJSON.fromCache(shared)
+
+
+def iterReaders(
+    fnames,
+    filterBy=None,
+    stream=False,
+    cache=True,
+    rules=None,
+    workers=None,
+    distinct=False,
+):
+    """Yields a MaltReaderJSON for every file in fnames"""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(fnames))
+    if workers <= 1:
+        for fname in fnames:
+            yield loaded_(
+                fname, MaltReaderJSON, fname, filterBy, stream, cache, rules, distinct
+            )
+        return
+
+    print(f"Loading {len(fnames)} files with {workers} processes")
+    # spawn rather than fork, the GUI may already be running
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        # only keep a few results ahead of the caller
+        todo = iter(fnames)
+        pending = deque()
+        for fname in todo:
+            args = (fname, filterBy, stream, cache, rules, distinct)
+            pending.append((fname, pool.submit(loadWorker_, *args)))
+            if len(pending) < 2 * workers:
+                continue
+            fname, future = pending.popleft()
+            yield attach_(fname, loaded_(fname, future.result), *args[1:])
+        for fname, future in pending:
+            yield attach_(fname, loaded_(fname, future.result), *args[1:])
+
+
+def loadReaders(
+    fnames,
+    filterBy=None,
+    stream=False,
+    cache=True,
+    rules=None,
+    workers=None,
+    distinct=False,
+):
+    """Returns a MaltReaderJSON for every file in fnames"""
+    return list(iterReaders(fnames, filterBy, stream, cache, rules, workers, distinct))
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+
+"""
+Rollups of a MALT profile by file, directory, project root and
+library.
+
+  MaltRollup.fromFrames(instrTable, columns):
+    instrTable: The MaltInstrTable of the profile
+       columns: A dictionary from metric (incl, excl, gIncl, gExcl or
+                leaks, the keys of fileAlloc) to a (rows, frames,
+                weights) tuple giving the stack (or leak stack), the
+                address id and the weight of every credited frame
+    Every file is placed in a tree of its directories and every
+    metric is summed bottom-up over the tree and over the libraries.
+    A stack is credited once to every node (or library) it goes
+    through, however many of its frames are in that node, so the
+    inclusive memory of a directory is that of the stacks which call
+    into it.
+
+Data Members:
+         paths: Path of every node of the tree, "" for the root of the
+                tree (the whole program), then directories and files
+        isFile: True for the file nodes
+        parent: Parent node of every node (-1 for the root)
+  childOffsets: The children of node i are the nodes
+                childOffsets[i]:childOffsets[i+1], sorted by path
+          root: Project root node of every node (-1 above the roots).
+                The project root of a file is the first directory
+                below "/" on its path where the tree branches or that
+                holds files, e.g. the top of a source checkout, or the
+                file itself if no such directory exists.
+        values: int64 matrix with one row per node and one column per
+                metric
+     libraries: Name of every library, "??" first for unknown ones
+     libValues: Same as values for every library
+      fileNode: Node of every file of instrTable
+
+Methods:
+   children(node):
+     Returns the array of the children of node.
+
+   value(node, metric):
+     Returns metric of node.
+
+   top(level, metric="incl", n=None):
+     Returns the names and values of the n (all if None) largest
+     file, directory, root (project root) or library rollups of
+     metric, largest first.
+"""
+
+import posixpath
+
+import numpy as np
+
+from maltReaderTables import firstPerRow, topIndices
+
+
+class MaltRollup:
+    metrics = ("incl", "excl", "gIncl", "gExcl", "leaks")
+    levels = ("file", "directory", "root", "library")
+    sectionNames = [
+        "paths",
+        "isFile",
+        "parent",
+        "childOffsets",
+        "root",
+        "values",
+        "libraries",
+        "libValues",
+        "fileNode",
+    ]
+
+    def __init__(
+        self,
+        paths,
+        isFile,
+        parent,
+        childOffsets,
+        root,
+        values,
+        libraries,
+        libValues,
+        fileNode,
+    ):
+        self.paths = paths
+        self.isFile = isFile
+        self.parent = parent
+        self.childOffsets = childOffsets
+        self.root = root
+        self.values = values
+        self.libraries = libraries
+        self.libValues = libValues
+        self.fileNode = fileNode
+
+    @classmethod
+    def fromFrames(cls, instrTable, columns):
+        """Builds the tree of the files and sums the columns over it"""
+        paths, isFile, parent, childOffsets, fileNode = cls.tree_(instrTable.files)
+        root = cls.roots_(paths, isFile, parent, childOffsets)
+
+        # The ancestors of every file, the file itself first
+        chains = []
+        for node in fileNode.tolist():
+            chain = []
+            while node >= 0:
+                chain.append(node)
+                node = int(parent[node])
+            chains.append(chain)
+        chainLength = np.array([len(c) for c in chains], dtype=np.int64)
+        chainStart = np.zeros(len(chains), dtype=np.int64)
+        np.cumsum(chainLength[:-1], out=chainStart[1:])
+        chain = np.array([x for c in chains for x in c], dtype=np.int64)
+
+        libraries = ["??"] + list(instrTable.binaries)
+        values = np.zeros((len(paths), len(cls.metrics)), dtype=np.int64)
+        libValues = np.zeros((len(libraries), len(cls.metrics)), dtype=np.int64)
+        for col, metric in enumerate(cls.metrics):
+            rows, frames, weights = columns[metric]
+            # every frame stands for its file and all its directories
+            files = instrTable.fileId[frames]
+            counts = chainLength[files]
+            ends = np.cumsum(counts)
+            pos = np.arange(ends[-1] if len(ends) else 0) - np.repeat(
+                ends - counts - chainStart[files], counts
+            )
+            nodes = chain[pos]
+            nodeRows = np.repeat(rows, counts)
+            once = firstPerRow(nodeRows, nodes)
+            np.add.at(
+                values[:, col], nodes[once], np.repeat(weights, counts)[once]
+            )
+            libs = instrTable.binaryId[frames].astype(np.int64) + 1
+            once = firstPerRow(rows, libs)
+            np.add.at(libValues[:, col], libs[once], weights[once])
+        return cls(
+            paths,
+            isFile,
+            parent,
+            childOffsets,
+            root,
+            values,
+            libraries,
+            libValues,
+            fileNode,
+        )
+
+    @staticmethod
+    def tree_(files):
+        """
+        Returns the paths, file flags, parents and child offsets of the
+        tree of files (in breadth first order) and the node of every
+        file
+        """
+        children = {"": []}
+        fileFlags = {"": False}
+        for path in files:
+            isFile = True
+            while path not in fileFlags:
+                fileFlags[path] = isFile
+                children.setdefault(path, [])
+                up = posixpath.dirname(path)
+                # "/" is its own directory
+                up = "" if up == path else up
+                children.setdefault(up, []).append(path)
+                path = up
+                isFile = False
+        paths = [""]
+        parent = [-1]
+        childOffsets = []
+        for node, path in enumerate(paths):
+            childOffsets.append(len(paths))
+            for child in sorted(children[path]):
+                paths.append(child)
+                parent.append(node)
+        childOffsets.append(len(paths))
+        nodeOf = {path: node for node, path in enumerate(paths)}
+        return (
+            paths,
+            np.array([fileFlags[p] for p in paths], dtype=bool),
+            np.array(parent, dtype=np.int64),
+            np.array(childOffsets, dtype=np.int64),
+            np.array([nodeOf[p] for p in files], dtype=np.int64),
+        )
+
+    @staticmethod
+    def roots_(paths, isFile, parent, childOffsets):
+        """Returns the project root of every node"""
+        root = np.full(len(paths), -1, dtype=np.int64)
+        nChildren = np.diff(childOffsets)
+        for node in range(1, len(paths)):
+            up = root[parent[node]]
+            if up >= 0:
+                root[node] = up
+                continue
+            children = range(childOffsets[node], childOffsets[node + 1])
+            if (
+                isFile[node]
+                or (paths[node] != "/" and nChildren[node] > 1)
+                or any(isFile[c] for c in children)
+            ):
+                root[node] = node
+        return root
+
+    def __len__(self):
+        return len(self.paths)
+
+    def children(self, node):
+        """Returns the children of node"""
+        return np.arange(self.childOffsets[node], self.childOffsets[node + 1])
+
+    def value(self, node, metric):
+        """Returns metric of node"""
+        return int(self.values[node, self.metrics.index(metric)])
+
+    def top(self, level, metric="incl", n=None):
+        """Returns the names and values of the largest rollups of level"""
+        if level not in self.levels:
+            raise ValueError(f"Unknown level {level}, use one of {self.levels}")
+        if metric not in self.metrics:
+            raise ValueError(f"Unknown metric {metric}, use one of {self.metrics}")
+        col = self.metrics.index(metric)
+        if level == "library":
+            names = self.libraries
+            values = self.libValues[:, col]
+        else:
+            if level == "file":
+                nodes = np.flatnonzero(self.isFile)
+            elif level == "directory":
+                nodes = np.flatnonzero(~self.isFile)[1:]
+            else:
+                nodes = np.flatnonzero(self.root == np.arange(len(self.root)))
+            names = [self.paths[x] for x in nodes.tolist()]
+            values = self.values[nodes, col]
+        best = topIndices(values, len(values) if n is None else n)
+        return [names[x] for x in best.tolist()], values[best]
+
+    def toSections(self):
+        return {name: getattr(self, name) for name in self.sectionNames}
+
+    @classmethod
+    def fromSections(cls, get, reader=None):
+        return cls(*[get(name) for name in cls.sectionNames])
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+"""
+Incremental reading of (very large) MALT JSON files.
+
+  MaltJSONStream(fp, chunkSize=4MB):
+       fp: A file opened in text mode
+    chunkSize: Number of characters read from fp at a time
+
+  The stream is walked with iterObject() and iterArray(), which yield
+  keys / indices and leave the stream positioned at the corresponding
+  value.  The caller must consume every value with one of value(),
+  skip(), iterObject() or iterArray() before asking for the next one.
+  Only the value being decoded is ever held in memory, so the peak
+  memory is bounded by whatever the caller decides to keep.
+
+  readMaltStream(fname, onStat=None):
+    Walks the sections of a MALT file that MaltReaderJSON uses
+    (globals, sites, stacks.stats, timeline.memoryTimeline and leaks)
+    and returns them in a dictionary laid out like the raw JSON.
+    Everything else (scatter, threads, memStats, ...) is skipped
+    without being built.  Stack addresses are interned so that each
+    address string is stored once.  If onStat is given, it is called
+    with every entry of stacks.stats as it is read instead of the
+    entry being kept in the returned dictionary.
+"""
+
+import re
+import sys
+import json
+
+
+class MaltJSONStream:
+    reWhite = re.compile(r"[ \t\n\r]*")
+    delimiters = ",]} \t\n\r"
+
+    def __init__(self, fp, chunkSize=1 << 22):
+        self.fp = fp
+        self.chunkSize = chunkSize
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill_(self, grow=False):
+        """
+        Reads the next chunk from the file, discarding what has
+        already been consumed.  If grow is set, the read is at least
+        as large as the current buffer so that retrying a partial
+        decode stays linear in the size of the value.
+        """
+        if self.eof:
+            return False
+        size = self.chunkSize
+        if grow:
+            size = max(size, len(self.buf) - self.pos)
+        chunk = self.fp.read(size)
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        if len(chunk) == 0:
+            self.eof = True
+        return len(chunk) > 0
+
+    def peek(self):
+        """Returns the next non-blank character without consuming it"""
+        while True:
+            self.pos = self.reWhite.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill_():
+                return ""
+
+    def expect_(self, chars):
+        c = self.peek()
+        if c == "" or c not in chars:
+            raise ValueError(f"Expected one of '{chars}' but found '{c}'")
+        self.pos += 1
+        return c
+
+    def value(self):
+        """Decodes and returns the next complete value"""
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a number cut by the end of the buffer still decodes,
+                # so only accept it once it is followed by a delimiter
+                if self.eof or (
+                    end < len(self.buf)
+                    and (
+                        self.buf[end] in self.delimiters
+                        or not isinstance(obj, (int, float))
+                    )
+                ):
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill_(grow=True)
+
+    def skip(self):
+        """Consumes the next value without keeping it"""
+        c = self.peek()
+        if c == "{":
+            for _ in self.iterObject():
+                self.skip()
+        elif c == "[":
+            for _ in self.iterArray():
+                self.skip()
+        else:
+            self.value()
+
+    def iterObject(self):
+        """Yields the keys of the next object"""
+        self.expect_("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect_(":")
+            yield key
+            if self.expect_(",}") == "}":
+                return
+
+    def iterArray(self):
+        """Yields the indices of the next array"""
+        self.expect_("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        idx = 0
+        while True:
+            yield idx
+            idx += 1
+            if self.expect_(",]") == "]":
+                return
+
+
+def readMaltStream(fname, onStat=None):
+    """
+    Returns the sections of the MALT file fname used by MaltReaderJSON
+    without building the rest of the JSON tree.
+    """
+    intern = sys.intern
+    data = {
+        "globals": {},
+        "sites": {"strings": [], "instr": {}},
+        "stacks": {"stats": []},
+        "timeline": {"memoryTimeline": {}},
+        "leaks": [],
+    }
+    with open(fname, "r") as fp:
+        stream = MaltJSONStream(fp)
+        for key in stream.iterObject():
+            if key == "globals":
+                data["globals"] = stream.value()
+            elif key == "sites":
+                for entry in stream.iterObject():
+                    if entry == "strings":
+                        data["sites"]["strings"] = stream.value()
+                    elif entry == "instr":
+                        instr = data["sites"]["instr"]
+                        for addr in stream.iterObject():
+                            instr[intern(addr)] = stream.value()
+                    else:
+                        stream.skip()
+            elif key == "stacks":
+                for entry in stream.iterObject():
+                    if entry != "stats":
+                        stream.skip()
+                        continue
+                    if onStat is None:
+                        onStat = data["stacks"]["stats"].append
+                    for _ in stream.iterArray():
+                        item = stream.value()
+                        item["stack"] = [intern(x) for x in item["stack"]]
+                        item["stackId"] = intern(item["stackId"])
+                        onStat(item)
+            elif key == "timeline":
+                for entry in stream.iterObject():
+                    if entry != "memoryTimeline":
+                        stream.skip()
+                        continue
+                    memTimeline = data["timeline"]["memoryTimeline"]
+                    for field in stream.iterObject():
+                        if field == "values":
+                            values = memTimeline["values"] = []
+                            for _ in stream.iterArray():
+                                values.append(stream.value())
+                        elif field == "callsite":
+                            callsite = memTimeline["callsite"] = []
+                            for _ in stream.iterArray():
+                                callsite.append(intern(stream.value()))
+                        else:
+                            memTimeline[field] = stream.value()
+            elif key == "leaks":
+                leaks = data["leaks"]
+                for _ in stream.iterArray():
+                    leak = stream.value()
+                    leak["stack"] = [intern(x) for x in leak["stack"]]
+                    leaks.append(leak)
+            else:
+                stream.skip()
+    return data
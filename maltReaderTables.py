@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+"""
+Compact, integer-interned tables for the sites and stacks of a MALT
+profile.
+
+  MaltInstrTable():
+    Assigns a dense integer id to every address seen in the profile
+    and, once resolve() has been called, holds per-address NumPy
+    arrays of ids into separate name tables:
+         addrs: list of address strings, indexed by address id
+        addrId: dictionary from address string to address id
+        funcId: function (demangled name, e.g. "foo()") of an address,
+                an index into funcNames
+        fullId: full function name of an address, an index into
+                fullNames
+        fileId: source file of an address, an index into files
+          line: line number of an address (-1 if unknown)
+      binaryId: binary of an address, an index into binaries (-1 if
+                unknown)
+         known: True for addresses that are in the instr table
+    Addresses that are not in the instr table resolve to function and
+    file "??".
+
+  MaltStackTable():
+    Holds all stacks in CSR form, a pair of NumPy arrays:
+       offsets: stack i is frames[offsets[i]:offsets[i+1]]
+        frames: address ids of all stacks, innermost frame first
+    together with the per-stack statistics
+      stackIds: list of stack id strings, indexed by row
+         rowOf: dictionary from stack id to row.  After merge() the
+                ids of merged stacks map to the row they were merged
+                into.
+         count: number of allocations
+           sum: allocated memory
+    globalPeak: memory held at global peak
+    infoFields: names of all the numeric fields of the MALT infos
+                record of a stack, nested ones joined with a dot
+                (alloc.count, free.sum, lifetime.max, maxAliveReq,
+                mmap.count, ...)
+         infos: int64 matrix with one row per stack and one column per
+                entry of infoFields; info(name) returns a column
+
+  MaltCallsites(stacks, instrTable, indexed):
+    A read only dictionary-like view from stack id (including the ids
+    of merged stacks) to the list of address strings of the stacks
+    flagged in indexed.
+
+  infoFold(name):
+    Returns how the infos field name combines over several stacks:
+    "min" for minima, "max" for maxima and "sum" for everything else.
+
+  foldInfos(fields, infos, groups, n):
+    Combines the rows of the infos matrix that have the same group
+    (0 to n-1) as infoFold says.  Minima skip the stacks whose count
+    for that field is 0.
+
+  groupSums(keys, *weights):
+    Sums every weight array over equal keys.  Returns the distinct
+    keys, in order of first appearance, and a list with the sums of
+    each weight.
+
+  firstPerRow(rows, keys):
+    Flags the first frame of every distinct key within each stack,
+    given the stack row and key of every frame (rows sorted).  Used to
+    credit a function or line once per stack however deep a recursion
+    repeats it.
+
+  topIndices(values, n):
+    Returns the indices of the n largest values, largest first, using
+    a partial selection rather than a full sort.
+
+All tables can be split into sections and rebuilt from them through
+toSections() and fromSections(get, reader) for the sidecar cache.
+"""
+
+import re
+from collections.abc import Mapping
+from array import array
+
+import numpy as np
+
+reDemangle = re.compile(r"\([^\)]*\)")
+
+
+class MaltInstrTable:
+    sectionNames = [
+        "addrs",
+        "funcNames",
+        "fullNames",
+        "files",
+        "binaries",
+        "funcId",
+        "fullId",
+        "fileId",
+        "line",
+        "binaryId",
+        "known",
+    ]
+
+    def __init__(self):
+        self.addrs = []
+        self.addrId = {}
+
+    def intern(self, addr):
+        """Returns the id of addr, assigning a new one if needed"""
+        idx = self.addrId.get(addr)
+        if idx is None:
+            idx = self.addrId[addr] = len(self.addrs)
+            self.addrs.append(addr)
+        return idx
+
+    def resolve(self, instr, strings):
+        """
+        Fills in the per-address arrays from the MALT instr dictionary
+        and string table.
+        """
+        for addr in instr:
+            self.intern(addr)
+        n = len(self.addrs)
+        funcNames = {"??": 0}
+        fullNames = {"??": 0}
+        files = {"??": 0}
+        binaries = {}
+        funcId = np.zeros(n, dtype=np.int32)
+        fullId = np.zeros(n, dtype=np.int32)
+        fileId = np.zeros(n, dtype=np.int32)
+        line = np.full(n, -1, dtype=np.int64)
+        binaryId = np.full(n, -1, dtype=np.int32)
+        known = np.zeros(n, dtype=bool)
+        for addr, iDict in instr.items():
+            idx = self.addrId[addr]
+            known[idx] = True
+            full = strings[iDict["function"]]
+            if full not in fullNames:
+                fullNames[full] = len(fullNames)
+            fullId[idx] = fullNames[full]
+            name = reDemangle.sub("()", full)
+            if name not in funcNames:
+                funcNames[name] = len(funcNames)
+            funcId[idx] = funcNames[name]
+            fname = strings[iDict["file"]] if "file" in iDict else "Unknown"
+            if fname not in files:
+                files[fname] = len(files)
+            fileId[idx] = files[fname]
+            if "line" in iDict:
+                line[idx] = iDict["line"]
+            if "binary" in iDict:
+                binary = strings[iDict["binary"]]
+                if binary not in binaries:
+                    binaries[binary] = len(binaries)
+                binaryId[idx] = binaries[binary]
+        self.funcNames = list(funcNames)
+        self.fullNames = list(fullNames)
+        self.files = list(files)
+        self.binaries = list(binaries)
+        self.funcId = funcId
+        self.fullId = fullId
+        self.fileId = fileId
+        self.line = line
+        self.binaryId = binaryId
+        self.known = known
+
+    def toSections(self):
+        return {name: getattr(self, name) for name in self.sectionNames}
+
+    @classmethod
+    def fromSections(cls, get, reader=None):
+        table = cls()
+        for name in cls.sectionNames:
+            setattr(table, name, get(name))
+        table.addrId = {addr: idx for idx, addr in enumerate(table.addrs)}
+        return table
+
+
+class MaltStackTable:
+    sectionNames = [
+        "stackIds",
+        "offsets",
+        "frames",
+        "count",
+        "sum",
+        "globalPeak",
+        "infoFields",
+        "infos",
+        "aliasIds",
+        "aliasRows",
+    ]
+
+    def __init__(self, instrTable=None):
+        self.instrTable = instrTable
+        self.stackIds = []
+        self.rowOf = {}
+        # stack ids that were merged into another row
+        self.aliasIds = []
+        self.aliasRows = np.zeros(0, dtype=np.int64)
+        # Python arrays are cheap to grow while stacks are appended
+        self.frames_ = array("i")
+        self.offsets_ = array("q", [0])
+        self.count_ = array("q")
+        self.sum_ = array("q")
+        self.globalPeak_ = array("q")
+        self.infoFields = []
+        self.infoPaths = None
+        self.infos_ = array("q")
+
+    @classmethod
+    def fromArrays(
+        cls,
+        instrTable,
+        stackIds,
+        offsets,
+        frames,
+        count,
+        sum,
+        globalPeak,
+        infoFields=None,
+        infos=None,
+    ):
+        """Returns a table holding the given stacks and statistics"""
+        table = cls(instrTable)
+        if infoFields is not None:
+            table.infoFields = infoFields
+            table.infos = infos
+        else:
+            table.infos = np.zeros((len(stackIds), 0), dtype=np.int64)
+        table.stackIds = stackIds
+        table.rowOf = {stackId: row for row, stackId in enumerate(stackIds)}
+        table.offsets = offsets
+        table.frames = frames
+        table.count = count
+        table.sum = sum
+        table.globalPeak = globalPeak
+        del table.frames_, table.offsets_, table.count_, table.sum_
+        del table.globalPeak_, table.infos_, table.infoPaths
+        return table
+
+    def append(self, item):
+        """Appends one entry of the MALT stacks.stats list"""
+        stackId = item["stackId"]
+        infos = item["infos"]
+        self.rowOf[stackId] = len(self.stackIds)
+        self.stackIds.append(stackId)
+        addrId = self.instrTable.addrId
+        try:
+            self.frames_.extend([addrId[x] for x in item["stack"]])
+        except KeyError:
+            intern = self.instrTable.intern
+            self.frames_.extend([intern(x) for x in item["stack"]])
+        self.offsets_.append(len(self.frames_))
+        self.count_.append(infos["alloc"]["count"])
+        self.sum_.append(infos["alloc"]["sum"])
+        self.globalPeak_.append(infos["globalPeak"])
+        if self.infoPaths is None:
+            self.infoPaths = self.infoPaths_(infos)
+            self.infoFields = [
+                key if sub is None else f"{key}.{sub}" for key, sub in self.infoPaths
+            ]
+        try:
+            self.infos_.extend(
+                [infos[k] if s is None else infos[k][s] for k, s in self.infoPaths]
+            )
+        except (KeyError, TypeError):
+            self.infos_.extend(self.infoRow_(infos))
+
+    @staticmethod
+    def infoPaths_(infos):
+        """Returns the (key, subkey) of every numeric field of infos"""
+        paths = []
+        for key, value in infos.items():
+            if isinstance(value, dict):
+                paths += [
+                    (key, sub)
+                    for sub, x in value.items()
+                    if isinstance(x, (int, float))
+                ]
+            elif isinstance(value, (int, float)):
+                paths.append((key, None))
+        return paths
+
+    def infoRow_(self, infos):
+        """Returns the infos fields of a stack whose record is unusual"""
+        row = []
+        for key, sub in self.infoPaths:
+            value = infos.get(key, 0)
+            if sub is not None:
+                value = value.get(sub, 0) if isinstance(value, dict) else 0
+            row.append(int(value))
+        return row
+
+    def finish(self):
+        """Converts the appended stacks to NumPy arrays"""
+        self.frames = np.frombuffer(self.frames_, dtype=np.int32).copy()
+        self.offsets = np.frombuffer(self.offsets_, dtype=np.int64).copy()
+        self.count = np.frombuffer(self.count_, dtype=np.int64).copy()
+        self.sum = np.frombuffer(self.sum_, dtype=np.int64).copy()
+        self.globalPeak = np.frombuffer(self.globalPeak_, dtype=np.int64).copy()
+        self.infos = (
+            np.frombuffer(self.infos_, dtype=np.int64)
+            .reshape(len(self), len(self.infoFields))
+            .copy()
+        )
+        del self.frames_, self.offsets_, self.count_, self.sum_, self.globalPeak_
+        del self.infos_, self.infoPaths
+
+    def info(self, name):
+        """Returns the column of the infos field name"""
+        return self.infos[:, self.infoFields.index(name)]
+
+    def __len__(self):
+        return len(self.stackIds)
+
+    def lengths(self):
+        """Returns the number of frames in every stack"""
+        return np.diff(self.offsets)
+
+    def rows(self):
+        """Returns the row of every frame in frames"""
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.lengths())
+
+    def stack(self, row):
+        """Returns the address ids of the stack in row"""
+        return self.frames[self.offsets[row] : self.offsets[row + 1]]
+
+    def removeFrames(self, remove):
+        """
+        Drops every frame whose address is flagged in the boolean
+        array remove, as well as repeats of an address within a stack
+        (the first occurrence is kept).
+        """
+        frames = self.frames
+        rows = self.rows()
+        keep = np.zeros(len(frames), dtype=bool)
+        key = rows * (len(remove) + 1) + frames
+        _, first = np.unique(key, return_index=True)
+        keep[first] = True
+        keep &= ~remove[frames]
+        kept = np.zeros(len(self.offsets), dtype=np.int64)
+        np.cumsum(np.bincount(rows[keep], minlength=len(self)), out=kept[1:])
+        self.frames = frames[keep]
+        self.offsets = kept
+
+    def merge(self):
+        """
+        Merges stacks whose frames are identical (typically after
+        filtering) by summing their statistics into the first of them.
+        Returns the number of stacks that were merged away.
+        """
+        offsets = (self.offsets * self.frames.itemsize).tolist()
+        data = self.frames.tobytes()
+        first = {}
+        newRow = np.empty(len(self), dtype=np.int64)
+        for row in range(len(self)):
+            key = data[offsets[row] : offsets[row + 1]]
+            newRow[row] = first.setdefault(key, len(first))
+        nMerged = len(self) - len(first)
+        if nMerged == 0:
+            return 0
+
+        keepRow = np.zeros(len(self), dtype=bool)
+        _, reps = np.unique(newRow, return_index=True)
+        keepRow[reps] = True
+        lengths = self.lengths()
+        self.frames = self.frames[keepRow[self.rows()]]
+        self.offsets = np.zeros(len(reps) + 1, dtype=np.int64)
+        np.cumsum(lengths[reps], out=self.offsets[1:])
+        for name in ("count", "sum", "globalPeak"):
+            total = np.zeros(len(reps), dtype=np.int64)
+            np.add.at(total, newRow, getattr(self, name))
+            setattr(self, name, total)
+        self.infos = foldInfos(self.infoFields, self.infos, newRow, len(reps))
+
+        stackIds = self.stackIds
+        aliases = np.flatnonzero(~keepRow)
+        self.aliasIds = self.aliasIds + [stackIds[x] for x in aliases.tolist()]
+        self.aliasRows = np.concatenate([newRow[self.aliasRows], newRow[aliases]])
+        self.stackIds = [stackIds[x] for x in reps.tolist()]
+        self.rowOf = dict(zip(stackIds, newRow.tolist()))
+        self.rowOf.update(zip(self.aliasIds, self.aliasRows.tolist()))
+        return nMerged
+
+    def toSections(self):
+        return {name: getattr(self, name) for name in self.sectionNames}
+
+    @classmethod
+    def fromSections(cls, get, reader=None):
+        table = cls(reader.instrTable if reader is not None else None)
+        for name in cls.sectionNames:
+            setattr(table, name, get(name))
+        table.rowOf = {stackId: row for row, stackId in enumerate(table.stackIds)}
+        table.rowOf.update(zip(table.aliasIds, table.aliasRows.tolist()))
+        return table
+
+
+class MaltCallsites(Mapping):
+    sectionNames = ["indexed"]
+
+    def __init__(self, stacks, instrTable, indexed):
+        self.stacks = stacks
+        self.addrs = instrTable.addrs
+        self.indexed = indexed
+
+    def row_(self, stackId):
+        row = self.stacks.rowOf.get(stackId)
+        if row is None or not self.indexed[row]:
+            raise KeyError(stackId)
+        return row
+
+    def __getitem__(self, stackId):
+        addrs = self.addrs
+        return [addrs[x] for x in self.stacks.stack(self.row_(stackId)).tolist()]
+
+    def __contains__(self, stackId):
+        row = self.stacks.rowOf.get(stackId)
+        return row is not None and bool(self.indexed[row])
+
+    def __iter__(self):
+        stacks = self.stacks
+        for row in np.flatnonzero(self.indexed).tolist():
+            yield stacks.stackIds[row]
+        for stackId, row in zip(stacks.aliasIds, stacks.aliasRows.tolist()):
+            if self.indexed[row]:
+                yield stackId
+
+    def __len__(self):
+        indexed = self.indexed
+        aliases = indexed[self.stacks.aliasRows]
+        return int(np.count_nonzero(indexed) + np.count_nonzero(aliases))
+
+    def toSections(self):
+        return {"indexed": self.indexed}
+
+    @classmethod
+    def fromSections(cls, get, reader):
+        return cls(reader.stacks, reader.instrTable, get("indexed"))
+
+
+def infoFold(name):
+    """Returns how the infos field name combines over stacks"""
+    if name.endswith(".min"):
+        return "min"
+    if name.endswith(".max") or name.startswith("max"):
+        return "max"
+    return "sum"
+
+
+def foldInfos(fields, infos, groups, n):
+    """Combines the rows of infos by group"""
+    folded = np.zeros((n, len(fields)), dtype=np.int64)
+    for col, name in enumerate(fields):
+        values = infos[:, col]
+        how = infoFold(name)
+        if how == "sum":
+            np.add.at(folded[:, col], groups, values)
+        elif how == "max":
+            np.maximum.at(folded[:, col], groups, values)
+        else:
+            # stacks that never did the thing have no minimum
+            count = name[: -len("min")] + "count"
+            valid = infos[:, fields.index(count)] > 0 if count in fields else None
+            column = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+            if valid is None:
+                np.minimum.at(column, groups, values)
+            else:
+                np.minimum.at(column, groups[valid], values[valid])
+            column[column == np.iinfo(np.int64).max] = 0
+            folded[:, col] = column
+    return folded
+
+
+def groupSums(keys, *weights):
+    """Sums each array of weights over equal keys"""
+    uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    # order the groups by their first appearance in keys
+    order = np.argsort(first, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    inverse = rank[inverse.reshape(-1)]
+    sums = []
+    for w in weights:
+        total = np.zeros(len(uniq), dtype=w.dtype)
+        np.add.at(total, inverse, w)
+        sums.append(total)
+    return uniq[order], sums
+
+
+def firstPerRow(rows, keys):
+    """Flags the first occurrence of every key within each row"""
+    # lexsort is stable, so the first of a run is the first occurrence
+    order = np.lexsort((keys, rows))
+    rows = rows[order]
+    keys = keys[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]) | (keys[1:] != keys[:-1])
+    once = np.zeros(len(order), dtype=bool)
+    once[order[first]] = True
+    return once
+
+
+def topIndices(values, n):
+    """Returns the indices of the n largest values, largest first"""
+    n = max(min(n, len(values)), 0)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if n < len(values):
+        best = np.argpartition(values, len(values) - n)[len(values) - n :]
+    else:
+        best = np.arange(len(values))
+    # ties keep the order of values
+    return best[np.lexsort((best, -values[best]))]
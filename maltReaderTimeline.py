@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+"""
+Columnar storage of the memory timeline of a MALT profile.
+
+  MaltTimeline(reader, fields, delta, values, siteIds, site, meta=None):
+      reader: The MaltReaderJSON used to resolve stacks
+      fields: Names of the leading columns of values, e.g.
+              requestedMem, physicalMem and virtualMem
+       delta: Time between two points in seconds
+      values: int64 matrix with one row per point
+     siteIds: List of the distinct callsite stack ids
+        site: Index into siteIds of the callsite of every point
+        meta: The remaining entries of the MALT memoryTimeline
+              (start, perPoints, ...)
+
+  MaltTimeline.fromMalt(reader, memTimeline, ticksPerSecond):
+    Builds the timeline from the MALT memoryTimeline dictionary.
+
+Data Members:
+    time: Time of every point in seconds, (index + 1) * delta
+
+Methods:
+   column(name):
+     Returns the column of values for the field name.
+
+   siteStack(s):
+     Returns the stack of callsite s as a list of instrMap entries.
+     Stacks are only resolved the first time they are asked for and
+     are shared by all the points with the same callsite.
+
+   stack(idx):
+     Returns the stack of point idx (see siteStack).
+
+   index(t):
+     Returns the index of the point nearest to time t in seconds, or
+     None if the timeline has no points or no time between them.
+     The points are evenly spaced, so this is arithmetic rather than a
+     search.
+"""
+
+import numpy as np
+
+
+class MaltTimeline:
+    sectionNames = ["fields", "delta", "values", "siteIds", "site", "meta"]
+
+    def __init__(self, reader, fields, delta, values, siteIds, site, meta=None):
+        self.reader = reader
+        self.fields = fields
+        self.delta = delta
+        self.values = values
+        self.siteIds = siteIds
+        self.site = site
+        self.meta = meta if meta is not None else {}
+        self.time = (np.arange(len(values)) + 1) * delta
+        self.stacks = {}
+
+    @classmethod
+    def fromMalt(cls, reader, memTimeline, ticksPerSecond):
+        """Builds a timeline from a MALT memoryTimeline dictionary"""
+        delta = float(memTimeline.get("perPoints", 1)) / float(ticksPerSecond)
+        fields = memTimeline.get("fields", [])
+        values = memTimeline.get("values", [])
+        if not isinstance(values, np.ndarray):
+            values = cls.matrix_(values, len(fields))
+        siteId = {}
+        callsite = memTimeline.get("callsite", [])
+        site = np.array(
+            [siteId.setdefault(x, len(siteId)) for x in callsite], dtype=np.int32
+        )
+        meta = {
+            k: v
+            for k, v in memTimeline.items()
+            if k not in ("fields", "values", "callsite")
+        }
+        return cls(reader, fields, delta, values, list(siteId), site, meta)
+
+    @staticmethod
+    def matrix_(values, width):
+        """Returns the list of points values as an int64 matrix"""
+        widths = {len(v) for v in values} or {width}
+        if len(widths) > 1:
+            # the missing fields of short points are 0
+            width = max(widths)
+            values = [list(v) + [0] * (width - len(v)) for v in values]
+        return np.array(values, dtype=np.int64).reshape(len(values), max(widths))
+
+    def __len__(self):
+        return len(self.values)
+
+    def column(self, name):
+        """Returns the values of field name"""
+        return self.values[:, self.fields.index(name)]
+
+    def siteStack(self, s):
+        """Returns the resolved stack of callsite s"""
+        stack = self.stacks.get(s)
+        if stack is None:
+            stack = self.stacks[s] = self.reader.annotatedStackFromId(
+                self.siteIds[s]
+            )
+        return stack
+
+    def stack(self, idx):
+        """Returns the resolved stack of point idx"""
+        return self.siteStack(int(self.site[idx]))
+
+    def index(self, t):
+        """Returns the index of the point nearest to time t, or None"""
+        if len(self.values) == 0 or self.delta <= 0:
+            return None
+        idx = int(round(t / self.delta)) - 1
+        return min(max(idx, 0), len(self.values) - 1)
+
+    def toSections(self):
+        return {name: getattr(self, name) for name in self.sectionNames}
+
+    @classmethod
+    def fromSections(cls, get, reader):
+        return cls(reader, *[get(name) for name in cls.sectionNames])
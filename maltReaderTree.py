@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+
+"""
+The calling-context tree of a MALT profile.
+
+  MaltCallTree.fromStacks(stacks, leaks):
+        stacks: The MaltStackTable of the profile
+         leaks: Its MaltLeakTable (see maltReaderLeaks.py)
+    Every stack and leak is a path from the root (node 0, the
+    program) through its frames, outermost first.  Stacks sharing
+    callers share the nodes of those callers.
+
+Data Members:
+        parent: Parent node of every node (-1 for the root)
+          addr: Address id of the frame of every node (-1 for the root)
+         depth: Number of frames from the root to every node
+  childOffsets: The children of node i are the nodes
+                childOffsets[i]:childOffsets[i+1], sorted by address
+          leaf: Node of every stack (row of the stack table); the
+                distinct leak stacks follow the stacks
+     exclusive: Matrix with one row per node and one column per
+                metric (count, sum, globalPeak, leaks, leakCount) for
+                the stacks that end at the node
+     inclusive: Same for all the stacks through the node
+
+  Nodes are numbered by depth, so a parent always comes before its
+  children.
+
+Methods:
+   value(node, metric, exclusive=False):
+     Returns the inclusive (or exclusive) metric of node.
+
+   children(node):
+     Returns the array of the children of node.
+
+   child(node, addr):
+     Returns the child of node for address id addr, or -1.
+
+   find(path):
+     Returns the node of a list of address ids, outermost first, or
+     -1 if no stack has that call path.
+
+   path(node):
+     Returns the address ids from the root down to node.
+"""
+
+import numpy as np
+
+NO_NODE = -1
+
+
+def uniqueInverse_(keys):
+    """Returns the sorted distinct keys and the index of every key in them"""
+    order = np.argsort(keys, kind="stable")
+    sortedKeys = keys[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = sortedKeys[1:] != sortedKeys[:-1]
+    inverse = np.empty(len(keys), dtype=np.int64)
+    inverse[order] = np.cumsum(first) - 1
+    return sortedKeys[first], inverse
+
+
+class MaltCallTree:
+    metrics = ("count", "sum", "globalPeak", "leaks", "leakCount")
+    sectionNames = [
+        "parent",
+        "addr",
+        "depth",
+        "childOffsets",
+        "leaf",
+        "exclusive",
+        "inclusive",
+    ]
+
+    def __init__(
+        self, parent, addr, depth, childOffsets, leaf, exclusive, inclusive
+    ):
+        self.parent = parent
+        self.addr = addr
+        self.depth = depth
+        self.childOffsets = childOffsets
+        self.leaf = leaf
+        self.exclusive = exclusive
+        self.inclusive = inclusive
+
+    @classmethod
+    def fromStacks(cls, stacks, leaks):
+        """Builds the tree of all the stacks and leaks"""
+        # The leak stacks are appended to the stacks as extra segments
+        lengths = np.concatenate([stacks.lengths(), leaks.lengths()])
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        frames = np.concatenate(
+            [stacks.frames.astype(np.int64), leaks.frames.astype(np.int64)]
+        )
+        nStacks = len(stacks)
+        weights = np.zeros((len(lengths), len(cls.metrics)), dtype=np.int64)
+        weights[:nStacks, 0] = stacks.count
+        weights[:nStacks, 1] = stacks.sum
+        weights[:nStacks, 2] = stacks.globalPeak
+        weights[nStacks:, 3] = leaks.stackMemory
+        weights[nStacks:, 4] = leaks.stackCount
+
+        # Add one level of nodes per depth, keyed by (parent, address)
+        leaf = np.zeros(len(lengths), dtype=np.int64)
+        parents = [np.array([NO_NODE], dtype=np.int64)]
+        addrs = [np.array([NO_NODE], dtype=np.int64)]
+        levels = [0, 1]
+        live = np.flatnonzero(lengths > 0)
+        depth = 0
+        while len(live) > 0:
+            addr = frames[offsets[live + 1] - 1 - depth]
+            keys, inverse = uniqueInverse_(leaf[live] << 32 | addr)
+            leaf[live] = levels[-1] + inverse
+            parents.append(keys >> 32)
+            addrs.append(keys & 0xFFFFFFFF)
+            levels.append(levels[-1] + len(keys))
+            depth += 1
+            live = live[lengths[live] > depth]
+        parent = np.concatenate(parents)
+        n = len(parent)
+        nodeDepth = np.repeat(
+            np.arange(len(levels) - 1, dtype=np.int32), np.diff(levels)
+        )
+        # parents are sorted as every level is sorted by parent
+        childOffsets = np.searchsorted(parent[1:], np.arange(n + 1)) + 1
+
+        exclusive = np.zeros((n, len(cls.metrics)), dtype=np.int64)
+        np.add.at(exclusive, leaf, weights)
+
+        # Sum the levels into their parents from the bottom up
+        inclusive = exclusive.copy()
+        for start, end in reversed(list(zip(levels[1:-1], levels[2:]))):
+            first = np.ones(end - start, dtype=bool)
+            first[1:] = parent[start + 1 : end] != parent[start : end - 1]
+            starts = np.flatnonzero(first)
+            inclusive[parent[start:end][starts]] += np.add.reduceat(
+                inclusive[start:end], starts
+            )
+        return cls(
+            parent,
+            np.concatenate(addrs).astype(np.int32),
+            nodeDepth,
+            childOffsets,
+            leaf,
+            exclusive,
+            inclusive,
+        )
+
+    def __len__(self):
+        return len(self.parent)
+
+    def value(self, node, metric, exclusive=False):
+        """Returns the inclusive (or exclusive) metric of node"""
+        values = self.exclusive if exclusive else self.inclusive
+        return int(values[node, self.metrics.index(metric)])
+
+    def children(self, node):
+        """Returns the children of node"""
+        return np.arange(self.childOffsets[node], self.childOffsets[node + 1])
+
+    def child(self, node, addr):
+        """Returns the child of node for address id addr"""
+        start, end = self.childOffsets[node], self.childOffsets[node + 1]
+        i = start + int(np.searchsorted(self.addr[start:end], addr))
+        if i < end and self.addr[i] == addr:
+            return int(i)
+        return NO_NODE
+
+    def find(self, path):
+        """Returns the node of the call path (address ids, outermost first)"""
+        node = 0
+        for addr in path:
+            node = self.child(node, addr)
+            if node == NO_NODE:
+                break
+        return node
+
+    def path(self, node):
+        """Returns the address ids from the root to node"""
+        path = []
+        while node > 0:
+            path.append(int(self.addr[node]))
+            node = int(self.parent[node])
+        return path[::-1]
+
+    def toSections(self):
+        return {name: getattr(self, name) for name in self.sectionNames}
+
+    @classmethod
+    def fromSections(cls, get, reader):
+        return cls(*[get(name) for name in cls.sectionNames])
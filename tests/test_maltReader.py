@@ -0,0 +1,178 @@
+# LANL Open Source Release ID O4736
+#
+# Copyright:
+# © 2024. Triad National Security, LLC. All rights reserved.  This
+# program was produced under U.S. Government contract 89233218CNA000001
+# for Los Alamos National Laboratory (LANL), which is operated by Triad
+# National Security, LLC for the U.S. Department of Energy/National
+# Nuclear Security Administration. All rights in the program are
+# reserved by Triad National Security, LLC, and the U.S. Department of
+# Energy/National Nuclear Security Administration. The Government is
+# granted for itself and others acting on its behalf a nonexclusive,
+# paid-up, irrevocable worldwide license in this material to reproduce,
+# prepare. derivative works, distribute copies to the public, perform
+# publicly and display publicly, and to permit others to do so.
+#
+# This program is released under the BSD-3 license.
+# Please see the README.MD file for more details
+
+"""
+Regression tests of MaltReaderJSON against the small profile in
+data/small.json.  The totals are checked against referenceIndex, a
+port of the original loop over the JSON stacks.
+"""
+
+import os
+import re
+import json
+import shutil
+
+import pytest
+
+from maltReaderJSON import MaltReaderJSON
+from maltReaderFilter import MaltFilter
+from maltReaderPool import loadReaders
+
+fixture = os.path.join(os.path.dirname(__file__), "data", "small.json")
+
+allocators = ["calloc", "malloc", "posix_memalign", "realloc"]
+allocators.append("operator new(unsigned long)")
+
+
+def isAllocator(function):
+    """The frames removed by the original filterAllocs_"""
+    return (
+        function in allocators
+        or function.startswith("__gnu_cxx::")
+        or function.find("/libstdc++/") > 0
+    )
+
+
+def addToKey(theDict, key, value):
+    theDict[key] = theDict.get(key, 0) + value
+
+
+def referenceIndex(fname, remove=isAllocator):
+    """
+    Returns count, inclusive, exclusive, globalPeak and fileAlloc (without
+    the leaks) as the original index_ built them, after removing the frames
+    whose function remove is True for
+    """
+    with open(fname) as fp:
+        data = json.load(fp)
+    names = data["sites"]["strings"]
+    instrMap = {}
+    for item, iDict in data["sites"]["instr"].items():
+        myFile = names[iDict["file"]] if "file" in iDict else "Unknown"
+        myFunction = names[iDict["function"]]
+        myName = re.sub(r"\([^\)]*\)", "()", myFunction)
+        instrMap[item] = [myName, myFile, iDict.get("line", -1), myFunction]
+
+    count, inclusive, exclusive, globalPeak, fileAlloc = {}, {}, {}, {}, {}
+    for item in data["stacks"]["stats"]:
+        theStack = {x: None for x in item["stack"] if not remove(instrMap[x][3])}
+        infos = item["infos"]
+        sumAlloc = infos["alloc"]["sum"]
+        peak = infos["globalPeak"]
+        if (sumAlloc == 0 or len(theStack) == 0) and peak == 0:
+            continue
+        excl = sumAlloc
+        for stackEntry in theStack:
+            name, fname, lineNum = instrMap[stackEntry][:3]
+            addToKey(count, name, infos["alloc"]["count"])
+            addToKey(inclusive, name, sumAlloc)
+            addToKey(exclusive, name, excl)
+            falloc = fileAlloc.setdefault(
+                fname, {"incl": {}, "excl": {}, "gIncl": {}, "gExcl": {}}
+            )
+            addToKey(falloc["incl"], lineNum, sumAlloc)
+            addToKey(falloc["excl"], lineNum, excl)
+            if peak > 0:
+                globalPeak.setdefault(name, [0, 0])[0] += peak
+                addToKey(falloc["gIncl"], lineNum, peak)
+                if excl > 0:
+                    globalPeak[name][1] += peak
+                    addToKey(falloc["gExcl"], lineNum, peak)
+            excl = 0
+    return count, inclusive, exclusive, globalPeak, fileAlloc
+
+
+def totals(reader):
+    """The index of reader in the layout of referenceIndex"""
+    fileAlloc = {
+        fname: {key: falloc[key] for key in ("incl", "excl", "gIncl", "gExcl")}
+        for fname, falloc in reader.fileAlloc.items()
+        if falloc["incl"] or falloc["gIncl"]
+    }
+    return (
+        reader.count,
+        reader.inclusive,
+        reader.exclusive,
+        reader.globalPeak,
+        fileAlloc,
+    )
+
+
+@pytest.fixture
+def profile(tmp_path):
+    """A copy of the fixture, so that its cache files go to tmp_path"""
+    fname = str(tmp_path / "small.json")
+    shutil.copy(fixture, fname)
+    return fname
+
+
+def test_index(profile):
+    reader = MaltReaderJSON(profile, cache=False)
+    assert totals(reader) == referenceIndex(profile)
+
+
+def test_allocators(profile):
+    # the preset is on by default, asking for it again changes nothing
+    reader = MaltReaderJSON(profile, cache=False, rules=["@allocators"])
+    assert totals(reader) == referenceIndex(profile)
+
+
+def test_filter(profile):
+    rules = ["!function:^solve\\(", "function:^recurse\\("]
+    reader = MaltReaderJSON(profile, cache=False, rules=rules)
+    removed = lambda x: isAllocator(x) or x.startswith(("solve(", "recurse("))
+    assert totals(reader) == referenceIndex(profile, removed)
+    assert "solve()" in totals(MaltReaderJSON(profile, cache=False))[1]
+    assert "solve()" not in reader.inclusive
+
+
+def test_rules():
+    preset = MaltFilter(["@allocators"], allocators=False)
+    assert preset.settings() == MaltFilter().settings()
+    assert MaltFilter(["function:x"], allocators=False).settings() == ["!function:x"]
+    assert MaltFilter(["+file:x"], allocators=False).settings() == ["+file:x"]
+    # a leading "-" would be taken for an option on the command line
+    with pytest.raises(ValueError):
+        MaltFilter(["-function:x"])
+
+
+def test_stream(profile):
+    plain = MaltReaderJSON(profile, cache=False)
+    stream = MaltReaderJSON(profile, stream=True, cache=False)
+    assert totals(stream) == totals(plain)
+    assert stream.callsite == plain.callsite
+    assert stream.leaks == plain.leaks
+
+
+def test_cache(profile):
+    built = MaltReaderJSON(profile)
+    assert os.path.exists(built.cache.cacheName)
+    cached = MaltReaderJSON(profile)
+    assert cached.cache.mm is not None
+    assert totals(cached) == totals(built)
+    assert cached.callsite == built.callsite
+    assert cached.leaks == built.leaks
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_loadError(profile, tmp_path, workers):
+    broken = str(tmp_path / "broken.json")
+    with open(broken, "w") as fp:
+        fp.write('{"run": ')
+    with pytest.raises(RuntimeError, match="broken.json"):
+        loadReaders([profile, broken], cache=False, workers=workers)